@@ -0,0 +1,169 @@
+"""
+Batch GCP Detection
+===================
+Runs AgProjectGCPDetector over a directory (or glob) of frames on a process
+pool and writes one row of centers and corners per frame to a CSV or
+Parquet file.
+
+Rows are written as frames finish, and frames already in the output are
+skipped, so an interrupted run picks up where it stopped. Every row is one
+line; a row cut short by a killed run is removed before resuming, and that
+frame is processed again.
+
+Usage:
+    python3 AP_batch.py OutputImages/ --output centers.csv --workers 8
+    python3 AP_batch.py "flight2/*.png" --output centers.parquet
+
+Parquet output needs pandas + pyarrow; progress is kept in
+<output>.partial.csv until the run completes.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+from AP_model import AgProjectGCPDetector
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+CORNERS = ["top_left", "top_right", "bottom_right", "bottom_left"]
+FIELDS = (["image", "detected", "center_x", "center_y",
+           "centroid_x", "centroid_y", "confidence"] +
+          [f"{name}_{axis}" for name in CORNERS for axis in ("x", "y")] +
+          ["error"])
+
+
+def list_frames(source):
+    """Sorted frame paths from a directory or a glob pattern."""
+    if os.path.isdir(source):
+        paths = [str(p) for p in Path(source).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES]
+    else:
+        paths = glob.glob(source)
+    return sorted(paths)
+
+
+def detect_frame(args):
+    """Decode and detect one frame. Runs in a worker process."""
+    image_path, min_val, subpixel = args
+    row = dict.fromkeys(FIELDS, "")
+    row["image"] = image_path
+    try:
+        detector = AgProjectGCPDetector(image_path)
+        detector.filter_white_pixels(min_val=min_val, fast=True)
+        center = detector.find_center(quiet=True)
+    except Exception as e:
+        row["detected"] = False
+        row["error"] = " ".join(str(e).split())  # keep each row on one line
+        return row
+
+    row["detected"] = center is not None
+    if center is None:
+        row["error"] = "no white pixels"
+        return row
+
+    row["center_x"], row["center_y"] = center
+    for name in CORNERS:
+        row[f"{name}_x"], row[f"{name}_y"] = detector.corners[name]
+    if subpixel:
+        centroid = detector.find_centroid()
+        row["centroid_x"], row["centroid_y"] = centroid["center"]
+        row["confidence"] = centroid["confidence"]
+    return row
+
+
+def read_done(path):
+    """Image paths already recorded in a CSV or Parquet output."""
+    if not os.path.exists(path):
+        return set()
+    if path.endswith(".parquet"):
+        import pandas as pd
+        return set(pd.read_parquet(path, columns=["image"])["image"])
+    with open(path, newline="") as f:
+        return {row["image"] for row in csv.DictReader(f)}
+
+
+def trim_incomplete_row(path, chunk=65536):
+    """Truncate a CSV back to its last complete line. Returns the bytes removed."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        pos = size
+        while pos > 0:
+            step = min(chunk, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            if pos + step == size and block.endswith(b"\n"):
+                return 0
+            i = block.rfind(b"\n")
+            if i >= 0:
+                end = pos + i + 1
+                f.truncate(end)
+                return size - end
+        f.truncate(0)
+        return size
+
+
+def finish_parquet(output, partial):
+    import pandas as pd
+    frames = [pd.read_csv(partial)]
+    if os.path.exists(output):
+        frames.insert(0, pd.read_parquet(output))
+    pd.concat(frames, ignore_index=True).to_parquet(output, index=False)
+    os.remove(partial)
+
+
+def run_batch(source, output, workers=None, min_val=240, subpixel=True, chunksize=4):
+    parquet = output.endswith(".parquet")
+    csv_path = output + ".partial.csv" if parquet else output
+
+    trimmed = trim_incomplete_row(csv_path)
+    if trimmed:
+        print(f"Removed an incomplete last row ({trimmed} bytes) from {csv_path}")
+
+    frames = list_frames(source)
+    done = read_done(output) | (read_done(csv_path) if parquet else set())
+    todo = [p for p in frames if p not in done]
+    print(f"{len(frames)} frames, {len(frames) - len(todo)} already done, {len(todo)} to process")
+
+    new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    start = time.perf_counter()
+    found = 0
+    with open(csv_path, "a", newline="") as f, Pool(workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new_file:
+            writer.writeheader()
+        tasks = ((p, min_val, subpixel) for p in todo)
+        for i, row in enumerate(pool.imap_unordered(detect_frame, tasks, chunksize=chunksize), 1):
+            writer.writerow(row)
+            found += bool(row["detected"])
+            if i % 100 == 0:
+                f.flush()
+                rate = i / (time.perf_counter() - start)
+                print(f"  {i}/{len(todo)} frames ({rate:.1f} frames/s)")
+
+    elapsed = time.perf_counter() - start
+    if parquet and os.path.exists(csv_path):
+        finish_parquet(output, csv_path)
+    rate = len(todo) / elapsed if elapsed > 0 else 0.0
+    print(f"Done: {len(todo)} frames in {elapsed:.1f}s ({rate:.1f} frames/s), GCP found in {found}")
+    return len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect GCP centers over a folder of frames.")
+    parser.add_argument("source", help="directory of frames or a glob pattern")
+    parser.add_argument("--output", default="gcp_centers.csv", help=".csv or .parquet")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--min-val", type=int, default=240, help="white threshold")
+    parser.add_argument("--no-subpixel", action="store_true", help="skip the moment centroid")
+    args = parser.parse_args()
+    run_batch(args.source, args.output, args.workers, args.min_val, not args.no_subpixel)
+
+
+if __name__ == "__main__":
+    main()
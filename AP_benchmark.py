@@ -0,0 +1,151 @@
+"""
+GCP Placement + Detection Benchmark
+===================================
+Closed-loop check of AgProjectGCPPlacer and AgProjectGCPDetector: places
+the GCP N times with seeded random scale and angle, detects it, and compares
+the detected center with the known placement.
+
+Reports center error (mean / p95 / max, for find_center and the sub-pixel
+find_centroid), per-stage timing (decode, transform, paste, filter,
+find_center, find_centroid) and peak memory, and writes everything as JSON
+so runs can be compared for accuracy and speed regressions.
+
+Peak RSS is always reported. --trace-memory also reports the peak of
+Python/numpy allocations via tracemalloc, which slows every stage, so its
+timings should not be compared with normal runs.
+
+Usage:
+    python3 AP_benchmark.py --runs 50 --seed 0 --output bench.json
+"""
+
+import argparse
+import json
+import random
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+
+from AP_getCam import AgProjectGCPPlacer
+from AP_model import AgProjectGCPDetector
+
+BASE_IMAGE = "BaseGreenField.png"
+OVERLAY_IMAGE = "gcp_singleRing_fixed_pattern.png"
+STAGES = ["decode", "transform", "paste", "filter", "find_center", "find_centroid"]
+
+
+def summarize(values):
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.size == 0:
+        return None
+    return {
+        "mean": round(float(arr.mean()), 4),
+        "p95": round(float(np.percentile(arr, 95)), 4),
+        "max": round(float(arr.max()), 4),
+    }
+
+
+def run_once(rng, min_scale, max_scale, base_path, overlay_path):
+    """One placement + detection. Returns (stage times in ms, true center, center, centroid)."""
+    times = {}
+
+    t = time.perf_counter()
+    placer = AgProjectGCPPlacer(base_path, overlay_path)
+    times["decode"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    placer.apply_random_transform(min_scale, max_scale, rng=rng)
+    times["transform"] = time.perf_counter() - t
+
+    # Keep the whole overlay inside the frame so the truth is well defined
+    w, h = placer.overlay_image.size
+    cx = rng.randint(w // 2, placer.base_image.width - w + w // 2)
+    cy = rng.randint(h // 2, placer.base_image.height - h + h // 2)
+    t = time.perf_counter()
+    placer.place_overlay(center_x=cx, center_y=cy)
+    times["paste"] = time.perf_counter() - t
+
+    # Pixel-center coordinates of the pasted overlay's middle
+    truth = (cx - w // 2 + (w - 1) / 2, cy - h // 2 + (h - 1) / 2)
+
+    detector = AgProjectGCPDetector(placer.base_image.convert("RGB"))
+    t = time.perf_counter()
+    detector.filter_white_pixels(fast=True)
+    times["filter"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    center = detector.find_center()
+    times["find_center"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    centroid = detector.find_centroid() if center is not None else None
+    times["find_centroid"] = time.perf_counter() - t
+
+    times = {k: v * 1000 for k, v in times.items()}
+    return times, truth, center, centroid
+
+
+def run_benchmark(runs=50, seed=0, min_scale=0.05, max_scale=0.12,
+                  base_path=BASE_IMAGE, overlay_path=OVERLAY_IMAGE, trace_memory=False):
+    rng = random.Random(seed)
+    stage_times = {stage: [] for stage in STAGES}
+    center_errors, centroid_errors, misses = [], [], 0
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(runs):
+        times, truth, center, centroid = run_once(rng, min_scale, max_scale, base_path, overlay_path)
+        for stage, ms in times.items():
+            stage_times[stage].append(ms)
+        if center is None:
+            misses += 1
+            continue
+        center_errors.append(float(np.hypot(center[0] - truth[0], center[1] - truth[1])))
+        cx, cy = centroid["center"]
+        centroid_errors.append(float(np.hypot(cx - truth[0], cy - truth[1])))
+    elapsed = time.perf_counter() - start
+    traced_peak = None
+    if trace_memory:
+        traced_peak = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        tracemalloc.stop()
+
+    return {
+        "runs": runs,
+        "seed": seed,
+        "scale_range": [min_scale, max_scale],
+        "angle_range": [0, 360],
+        "misses": misses,
+        "center_error_px": summarize(center_errors),
+        "centroid_error_px": summarize(centroid_errors),
+        "stage_ms": {stage: summarize(v) for stage, v in stage_times.items()},
+        "frames_per_s": round(runs / elapsed, 2) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "traced_peak_mb": traced_peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and latency benchmark for placer + detector.")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-scale", type=float, default=0.05)
+    parser.add_argument("--max-scale", type=float, default=0.12)
+    parser.add_argument("--base", default=BASE_IMAGE)
+    parser.add_argument("--overlay", default=OVERLAY_IMAGE)
+    parser.add_argument("--trace-memory", action="store_true", help="also trace allocations (slower)")
+    parser.add_argument("--output", default=None, help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs, args.seed, args.min_scale, args.max_scale,
+                           args.base, args.overlay, args.trace_memory)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Synthetic GCP Dataset Generator
+===============================
+Produces labelled training frames for retraining best.pt: each frame is
+BaseGreenField.png with the GCP pattern pasted at a random scale, angle and
+position (AgProjectGCPGenerator), and each gets a YOLO-format label file
+computed from the known placement. Up to --clip of the GCP may fall off the
+frame, on any side equally often, so partly visible targets are in the set.
+
+Work is spread over a multiprocessing pool. Every worker builds its own
+generator (so the overlay cache stays warm per process; --cache-size bounds
+its memory, ~100 KB per overlay), and every image
+uses its own RNG seeded from --seed and its index, so a given seed always
+produces the same dataset whatever the worker count. The same RNG assigns
+each image to the train or the held-out val split (--val-fraction).
+
+Usage:
+    python3 AP_dataset.py --count 20000 --output GCPDataset --format jpg --workers 8
+
+Output layout (YOLO):
+    <output>/images/{train,val}/gcp_000000.jpg
+    <output>/labels/{train,val}/gcp_000000.txt   ->  "0 cx cy w h" (normalized)
+    <output>/data.yaml
+"""
+
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from AP_getCam import AgProjectGCPGenerator
+
+BASE_IMAGE = "BaseGreenField.png"
+OVERLAY_IMAGE = "gcp_singleRing_fixed_pattern.png"
+FORMATS = ("png", "jpg", "npy")
+SPLITS = ("train", "val")
+GCP_CLASS = 0
+
+_worker = {}
+
+
+def _init_worker(base_path, overlay_path, output, fmt, seed, min_scale, max_scale, jpeg_quality,
+                 clip, val_fraction, cache_size):
+    _worker["generator"] = AgProjectGCPGenerator(base_path, overlay_path, max_scale=max_scale,
+                                                 cache_size=cache_size)
+    _worker.update(output=output, fmt=fmt, seed=seed, min_scale=min_scale,
+                   max_scale=max_scale, jpeg_quality=jpeg_quality, clip=clip,
+                   val_fraction=val_fraction)
+
+
+def yolo_label(box, width, height):
+    """YOLO "class cx cy w h" line for a pixel box (x0, y0, x1, y1)."""
+    x0, y0, x1, y1 = box
+    cx = (x0 + x1) / 2 / width
+    cy = (y0 + y1) / 2 / height
+    return f"{GCP_CLASS} {cx:.6f} {cy:.6f} {(x1 - x0) / width:.6f} {(y1 - y0) / height:.6f}\n"
+
+
+def generate_one(index):
+    """Generate, write and label one frame. Runs in a worker process."""
+    w = _worker
+    rng = random.Random(f"{w['seed']}-{index}")
+    split = "val" if rng.random() < w["val_fraction"] else "train"
+    frame, info = w["generator"].generate(w["min_scale"], w["max_scale"], rng=rng, clip=w["clip"])
+
+    name = f"gcp_{index:06d}"
+    image_path = os.path.join(w["output"], "images", split, f"{name}.{w['fmt']}")
+    if w["fmt"] == "npy":
+        np.save(image_path, np.asarray(frame))
+    elif w["fmt"] == "jpg":
+        frame.save(image_path, "JPEG", quality=w["jpeg_quality"])
+    else:
+        frame.save(image_path, "PNG", compress_level=1)
+
+    # A frame whose GCP fell entirely outside gets an empty label (a negative)
+    label = yolo_label(info["box"], frame.width, frame.height) if info["box"] else ""
+    with open(os.path.join(w["output"], "labels", split, f"{name}.txt"), "w") as f:
+        f.write(label)
+    return index
+
+
+def write_data_yaml(output):
+    path = os.path.join(output, "data.yaml")
+    if os.path.exists(path):
+        return
+    with open(path, "w") as f:
+        f.write(f"path: {os.path.abspath(output)}\n"
+                "train: images/train\n"
+                "val: images/val\n"
+                "names:\n"
+                f"  {GCP_CLASS}: gcp\n")
+
+
+def generate_dataset(count, output, fmt="jpg", workers=None, seed=0, start=0,
+                     min_scale=0.05, max_scale=0.12, jpeg_quality=95,
+                     base_path=BASE_IMAGE, overlay_path=OVERLAY_IMAGE, clip=0.5, val_fraction=0.1,
+                     cache_size=512):
+    for split in SPLITS:
+        os.makedirs(os.path.join(output, "images", split), exist_ok=True)
+        os.makedirs(os.path.join(output, "labels", split), exist_ok=True)
+    write_data_yaml(output)
+
+    t0 = time.perf_counter()
+    initargs = (base_path, overlay_path, output, fmt, seed, min_scale, max_scale, jpeg_quality,
+                clip, val_fraction, cache_size)
+    with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+        indices = range(start, start + count)
+        for done, _ in enumerate(pool.imap_unordered(generate_one, indices, chunksize=16), 1):
+            if done % 500 == 0:
+                print(f"  {done}/{count} images ({done / (time.perf_counter() - t0):.1f} images/s)")
+
+    elapsed = time.perf_counter() - t0
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Generated {count} images in {elapsed:.1f}s ({rate:.1f} images/s) -> {output}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a labelled synthetic GCP dataset.")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--output", default="GCPDataset")
+    parser.add_argument("--format", choices=FORMATS, default="jpg",
+                        help="jpg/npy are much faster to write than png")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=int, default=0, help="first image index (to extend a dataset)")
+    parser.add_argument("--min-scale", type=float, default=0.05)
+    parser.add_argument("--max-scale", type=float, default=0.12)
+    parser.add_argument("--jpeg-quality", type=int, default=95)
+    parser.add_argument("--clip", type=float, default=0.5,
+                        help="largest fraction of the GCP that may fall outside the frame")
+    parser.add_argument("--val-fraction", type=float, default=0.1,
+                        help="share of images held out for validation")
+    parser.add_argument("--cache-size", type=int, default=512,
+                        help="overlays cached per worker (~100 KB each)")
+    parser.add_argument("--base", default=BASE_IMAGE)
+    parser.add_argument("--overlay", default=OVERLAY_IMAGE)
+    args = parser.parse_args()
+
+    generate_dataset(args.count, args.output, args.format, args.workers, args.seed, args.start,
+                     args.min_scale, args.max_scale, args.jpeg_quality, args.base, args.overlay,
+                     args.clip, args.val_fraction, args.cache_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from PIL import Image
 import random
+from functools import lru_cache
 
 class AgProjectGCPPlacer:
     def __init__(self, base_image_path, overlay_image_path):
@@ -11,23 +12,23 @@ class AgProjectGCPPlacer:
         self.angle = None
         self.center_position = None
 
-    def apply_random_transform(self, min_scale=0.05, max_scale=0.12):
+    def apply_random_transform(self, min_scale=0.05, max_scale=0.12, rng=random):
         # Random rotation
-        self.angle = random.uniform(0, 360)
+        self.angle = rng.uniform(0, 360)
         rotated_overlay = self.overlay_image.rotate(self.angle, expand=True)
 
         # Random scale based on base image
-        self.scale_factor = random.uniform(min_scale, max_scale)
+        self.scale_factor = rng.uniform(min_scale, max_scale)
         new_width = int(self.base_image.width * self.scale_factor)
         aspect_ratio = rotated_overlay.height / rotated_overlay.width
         new_height = int(new_width * aspect_ratio)
         self.overlay_image = rotated_overlay.resize((new_width, new_height), Image.LANCZOS)
 
-    def place_overlay(self, center_x=None, center_y=None):
+    def place_overlay(self, center_x=None, center_y=None, rng=random):
         if center_x is None:
-            center_x = random.randint(0, self.base_image.width - self.overlay_image.width)
+            center_x = rng.randint(0, self.base_image.width - self.overlay_image.width)
         if center_y is None:
-            center_y = random.randint(0, self.base_image.height - self.overlay_image.height)
+            center_y = rng.randint(0, self.base_image.height - self.overlay_image.height)
 
         self.center_position = (center_x, center_y)
 
@@ -41,6 +42,117 @@ class AgProjectGCPPlacer:
         self.base_image.convert("RGB").save(output_path)
         print(f"Scale factor: {self.scale_factor:.4f}, Rotation angle: {self.angle:.2f}, Center Position: {self.center_position}")
 
+class AgProjectGCPGenerator:
+    """
+    Synthetic frame source for repeated placements. The base and overlay are
+    decoded once; rotated and scaled overlays are kept in an LRU cache keyed
+    by angle and scale quantized to angle_step / scale_step, so each new
+    frame costs a copy of the base plus one paste.
+
+    The steps set the number of distinct overlays: 5 deg x 0.005 is 72 x 25
+    keys for scales up to 0.12. Each cached overlay is ~100 KB, so the
+    default keeps 128 of them (~13 MB); callers that generate many frames
+    can raise cache_size, and cache_size=None holds the whole grid (~180 MB
+    at the defaults).
+    """
+
+    def __init__(self, base_image_path, overlay_image_path,
+                 angle_step=5, scale_step=0.005, cache_size=128, max_scale=None):
+        self.base_path = base_image_path
+        self.overlay_path = overlay_image_path
+        self.base_image = Image.open(self.base_path).convert("RGB")
+        self.overlay_image = Image.open(self.overlay_path).convert("RGBA")
+        if max_scale:
+            # Pre-shrink the overlay to 2x the largest size it will be placed at;
+            # rotating the full-resolution pattern dominates the cost of a cache miss
+            width = int(2 * self.base_image.width * max_scale)
+            if width < self.overlay_image.width:
+                height = int(width * self.overlay_image.height / self.overlay_image.width)
+                self.overlay_image = self.overlay_image.resize((width, height), Image.LANCZOS)
+        self.angle_step = angle_step
+        self.scale_step = scale_step
+        if cache_size is None:
+            cache_size = self.grid_size(max_scale or 0.12)
+        self._overlay_cache = lru_cache(maxsize=cache_size)(self._build_overlay)
+
+    def _build_overlay(self, angle_q, scale_q):
+        # Same rotate-then-resize as AgProjectGCPPlacer.apply_random_transform
+        rotated_overlay = self.overlay_image.rotate(angle_q * self.angle_step, expand=True)
+        new_width = int(self.base_image.width * scale_q * self.scale_step)
+        aspect_ratio = rotated_overlay.height / rotated_overlay.width
+        new_height = int(new_width * aspect_ratio)
+        overlay = rotated_overlay.resize((new_width, new_height), Image.LANCZOS)
+        # Tight box of the visible (non-transparent) pixels, for labels
+        return overlay, overlay.getchannel("A").getbbox()
+
+    def grid_size(self, max_scale):
+        """Number of quantized (angle, scale) keys for scales up to max_scale."""
+        return round(360 / self.angle_step) * (round(max_scale / self.scale_step) + 1)
+
+    def quantize(self, angle, scale):
+        return round(angle / self.angle_step) % round(360 / self.angle_step), round(scale / self.scale_step)
+
+    def transformed_overlay(self, angle, scale):
+        """Rotated and scaled overlay for the nearest cached angle and scale."""
+        angle_q, scale_q = self.quantize(angle, scale)
+        overlay, bbox = self._overlay_cache(angle_q, scale_q)
+        return overlay, bbox, angle_q * self.angle_step, scale_q * self.scale_step
+
+    def cache_info(self):
+        return self._overlay_cache.cache_info()
+
+    def generate(self, min_scale=0.05, max_scale=0.12, center_x=None, center_y=None,
+                 angle=None, scale=None, rng=random, clip=0.0):
+        """
+        Place the overlay on a fresh copy of the base. A random center is
+        drawn so that up to `clip` of the overlay's width/height may fall
+        outside the frame, equally likely on every side (0 keeps it whole).
+        Returns (frame, info)
+        where frame is an RGB PIL image and info holds the applied scale,
+        angle, center_position, overlay size, and the visible overlay box
+        (x0, y0, x1, y1) in frame pixels, clipped to the frame (None if the
+        overlay lies entirely outside it).
+        """
+        if angle is None:
+            angle = rng.uniform(0, 360)
+        if scale is None:
+            scale = rng.uniform(min_scale, max_scale)
+        overlay, bbox, angle, scale = self.transformed_overlay(angle, scale)
+
+        # Symmetric about the frame, unlike AgProjectGCPPlacer.place_overlay,
+        # whose range can push the overlay off the left/top edges only
+        if center_x is None:
+            margin = int(overlay.width * clip)
+            center_x = rng.randint(overlay.width // 2 - margin,
+                                   self.base_image.width - overlay.width + overlay.width // 2 + margin)
+        if center_y is None:
+            margin = int(overlay.height * clip)
+            center_y = rng.randint(overlay.height // 2 - margin,
+                                   self.base_image.height - overlay.height + overlay.height // 2 + margin)
+        x = center_x - overlay.width // 2
+        y = center_y - overlay.height // 2
+
+        frame = self.base_image.copy()
+        frame.paste(overlay, (x, y), overlay)
+
+        box = None
+        if bbox is not None:
+            x0, y0 = max(x + bbox[0], 0), max(y + bbox[1], 0)
+            x1 = min(x + bbox[2], self.base_image.width)
+            y1 = min(y + bbox[3], self.base_image.height)
+            if x1 > x0 and y1 > y0:
+                box = (x0, y0, x1, y1)
+
+        info = {
+            "scale": scale,
+            "angle": angle,
+            "center_position": (center_x, center_y),
+            "overlay_size": overlay.size,
+            "box": box,
+        }
+        return frame, info
+
+
 # === Example usage ===
 if __name__ == "__main__":
     placer = AgProjectGCPPlacer("rPiCameraImage.png", "gcp_singleRing_fixed_pattern.png")
@@ -2,28 +2,100 @@ from PIL import Image
 import numpy as np
 from math import ceil
 
+def extent_geometry(x_min, x_max, y_min, y_max):
+    """Corners, diagonal midpoints and averaged center of a bounding box."""
+    corners = {
+        "top_left": (x_min, y_min),
+        "top_right": (x_max, y_min),
+        "bottom_right": (x_max, y_max),
+        "bottom_left": (x_min, y_max),
+    }
+
+    # Midpoints of diagonals
+    mid1 = (ceil((x_min + x_max) / 2), ceil((y_min + y_max) / 2))  # TL to BR
+    mid2 = (ceil((x_max + x_min) / 2), ceil((y_min + y_max) / 2))  # TR to BL
+    midpoints = {"diag1": mid1, "diag2": mid2}
+
+    # Final averaged center
+    center = ((mid1[0] + mid2[0]) / 2, (mid1[1] + mid2[1]) / 2)
+    return corners, midpoints, center
+
+
+def to_rgb_array(image):
+    """RGB numpy view of a file path, PIL image or H x W x 3(+) array."""
+    if isinstance(image, np.ndarray):
+        return image[:, :, :3]
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    return np.asarray(image.convert("RGB"))
+
+
 class AgProjectGCPDetector:
-    def __init__(self, input_image_path):
-        self.image_path = input_image_path
-        self.original_image = Image.open(self.image_path).convert("RGB")
-        self.filtered_image = None
+    def __init__(self, input_image):
+        # input_image may be a file path, a PIL image or an RGB numpy array,
+        # so in-memory frames don't need a PNG round trip
+        if isinstance(input_image, (Image.Image, np.ndarray)):
+            self.image_path = None
+        else:
+            self.image_path = input_image
+        self.image_np = to_rgb_array(input_image)
+        self._original_image = None
+        self._filtered_image = None
+        self.mask = None
+        self.min_val = 240  # threshold of the last filter_white_pixels(), reused by find_centroid
         self.corners = {}
         self.midpoints = {}
         self.center = None
+        self.labels = None
+        self.components = []
+        self.centroid = None
+
+    @property
+    def original_image(self):
+        if self._original_image is None:
+            self._original_image = Image.fromarray(self.image_np)
+        return self._original_image
 
-    def filter_white_pixels(self, min_val=240, max_val=255):
-        img_np = np.array(self.original_image)
+    @property
+    def filtered_image(self):
+        # Built from the mask on first use, so fast mode only pays for it when saving
+        if self._filtered_image is None and self.mask is not None:
+            filtered_img_np = np.zeros(self.mask.shape + (3,), dtype=np.uint8)
+            filtered_img_np[self.mask] = 255
+            self._filtered_image = Image.fromarray(filtered_img_np)
+        return self._filtered_image
 
-        # Create binary mask for white-ish pixels
-        mask = (
-            (img_np[:, :, 0] >= min_val) & (img_np[:, :, 0] <= max_val) &
-            (img_np[:, :, 1] >= min_val) & (img_np[:, :, 1] <= max_val) &
-            (img_np[:, :, 2] >= min_val) & (img_np[:, :, 2] <= max_val)
-        )
+    @filtered_image.setter
+    def filtered_image(self, image):
+        self._filtered_image = image
+
+    @staticmethod
+    def white_mask(img_np, min_val=240, max_val=255):
+        """Binary mask of pixels whose R, G and B all lie in [min_val, max_val]."""
+        r, g, b = img_np[:, :, 0], img_np[:, :, 1], img_np[:, :, 2]
+        mask = np.minimum(np.minimum(r, g), b) >= min_val
+        if max_val < np.iinfo(img_np.dtype).max:
+            mask &= np.maximum(np.maximum(r, g), b) <= max_val
+        return mask
+
+    def filter_white_pixels(self, min_val=240, max_val=255, fast=False):
+        """
+        Mask white-ish pixels. With fast=True the filtered RGB image is not
+        built here (it is built on demand by save_filtered_image) and
+        (mask, None) is returned.
+        """
+        img_np = self.image_np
+        mask = self.white_mask(img_np, min_val, max_val)
+        self.mask = mask
+        self.min_val = min_val
+        self._filtered_image = None
+
+        if fast:
+            return mask, None
 
         filtered_img_np = np.zeros_like(img_np)
         filtered_img_np[mask] = [255, 255, 255]
-        self.filtered_image = Image.fromarray(filtered_img_np)
+        self._filtered_image = Image.fromarray(filtered_img_np)
 
         return mask, filtered_img_np
 
@@ -31,37 +103,224 @@ class AgProjectGCPDetector:
         if self.filtered_image:
             self.filtered_image.save(output_path)
 
-    def find_center(self):
-        if self.filtered_image is None:
+    @staticmethod
+    def mask_extent(mask):
+        """(x_min, x_max, y_min, y_max) of the True pixels in mask, or None if empty."""
+        rows = mask.any(axis=1)
+        if not rows.any():
+            return None
+        cols = mask.any(axis=0)
+        y_min = int(np.argmax(rows))
+        y_max = len(rows) - 1 - int(np.argmax(rows[::-1]))
+        x_min = int(np.argmax(cols))
+        x_max = len(cols) - 1 - int(np.argmax(cols[::-1]))
+        return x_min, x_max, y_min, y_max
+
+    def find_center(self, quiet=False):
+        """Center of the white mask's bounding box, or None if it is empty
+        (printed unless quiet, e.g. for batch runs over many empty frames)."""
+        if self.mask is None:
             raise RuntimeError("Run filter_white_pixels() before detecting center.")
 
-        img_np = np.array(self.filtered_image)
-        white_mask = np.all(img_np == [255, 255, 255], axis=2)
-        ys, xs = np.where(white_mask)
+        # Extent from per-axis any() on the mask, no coordinate arrays needed
+        extent = self.mask_extent(self.mask)
 
-        if len(xs) == 0 or len(ys) == 0:
-            print("No white pixels found.")
+        if extent is None:
+            if not quiet:
+                print("No white pixels found.")
             return None
 
-        x_min, x_max = int(xs.min()), int(xs.max())
-        y_min, y_max = int(ys.min()), int(ys.max())
+        self.corners, self.midpoints, self.center = extent_geometry(*extent)
+        return self.center
+
+    def find_components(self, min_area=50, max_area=None, min_fill=0.2, max_aspect=3.0,
+                        connectivity=8):
+        """
+        Label connected white regions so a second GCP, glare or white equipment
+        is reported separately instead of merging into one bounding box.
+
+        Each component that passes the size and shape filters is returned as a
+        dict with its pixel centroid, area, corners and label, largest first.
+        fill is area / bounding-box area; aspect is the bounding box's long side
+        over its short side.
+        """
+        if self.mask is None:
+            raise RuntimeError("Run filter_white_pixels() before finding components.")
+        import cv2  # connectedComponentsWithStats is a single linear pass
+
+        count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            self.mask.view(np.uint8), connectivity=connectivity)
+        self.labels = labels
+
+        components = []
+        for label in range(1, count):
+            x, y, w, h, area = (int(v) for v in stats[label])
+            if area < min_area or (max_area is not None and area > max_area):
+                continue
+            fill = area / (w * h)
+            aspect = max(w, h) / min(w, h)
+            if fill < min_fill or (max_aspect is not None and aspect > max_aspect):
+                continue
+            cx, cy = centroids[label]
+            components.append({
+                "label": label,
+                "center": (round(float(cx), 2), round(float(cy), 2)),
+                "area": area,
+                "fill": round(fill, 3),
+                "aspect": round(aspect, 3),
+                "corners": {
+                    "top_left": (x, y),
+                    "top_right": (x + w - 1, y),
+                    "bottom_right": (x + w - 1, y + h - 1),
+                    "bottom_left": (x, y + h - 1),
+                },
+            })
+
+        components.sort(key=lambda c: c["area"], reverse=True)
+        self.components = components
+        return components
+
+    def find_centroid(self, component=None, fit_ring=False, min_val=None):
+        """
+        Sub-pixel GCP center from intensity-weighted image moments.
+
+        The GCP is a convex white tile, so each row of the region is filled
+        between its first and last white pixel (the black pattern counts as
+        part of the tile and cannot pull the centroid off-center). The pixel
+        just outside each end of the span is weighted by its brightness, which
+        recovers the anti-aliased edge to sub-pixel precision. All moments
+        come from per-row closed forms, so the cost is one pass over the
+        bounding box.
+
+        component is a dict from find_components(); by default the whole white
+        mask is used, as in find_center(). With fit_ring=True a circle is also
+        fitted to the edge of the central black dot of the
+        gcp_singleRing_fixed_pattern target; how well it fits, and how close
+        its center is to the moment centroid, scale the confidence. min_val
+        (the white level for edge weights) defaults to the threshold passed to
+        filter_white_pixels().
+
+        Returns {"center": (x, y), "confidence": 0..1, "ring": dict or None}.
+        """
+        if self.mask is None:
+            raise RuntimeError("Run filter_white_pixels() before detecting center.")
+        if min_val is None:
+            min_val = self.min_val
+
+        if component is not None:
+            x_min, y_min = component["corners"]["top_left"]
+            x_max, y_max = component["corners"]["bottom_right"]
+            region = self.labels[y_min:y_max + 1, x_min:x_max + 1] == component["label"]
+        else:
+            extent = self.mask_extent(self.mask)
+            if extent is None:
+                print("No white pixels found.")
+                return None
+            x_min, x_max, y_min, y_max = extent
+            region = self.mask[y_min:y_max + 1, x_min:x_max + 1]
+
+        height, width = self.mask.shape
+        bx0, bx1 = max(x_min - 1, 0), min(x_max + 2, width)
+        img = self.image_np[y_min:y_max + 1, bx0:bx1]
+        brightness = np.minimum(np.minimum(img[:, :, 0], img[:, :, 1]), img[:, :, 2])
+
+        # Background level from the pixels beside the tile, for edge weights
+        rows_hit = region.any(axis=1)
+        left = np.argmax(region, axis=1)
+        right = region.shape[1] - 1 - np.argmax(region[:, ::-1], axis=1)
+        rows = np.nonzero(rows_hit)[0]
+        left, right = left[rows], right[rows]
+        lx, rx = left + x_min - bx0 - 1, right + x_min - bx0 + 1
+        lx_ok, rx_ok = lx >= 0, rx < brightness.shape[1]
+        edge_left = np.where(lx_ok, brightness[rows, np.clip(lx, 0, None)], 0).astype(np.float64)
+        edge_right = np.where(rx_ok, brightness[rows, np.clip(rx, None, brightness.shape[1] - 1)], 0)
+        background = float(np.median(np.concatenate([edge_left[lx_ok], edge_right[rx_ok]]))) \
+            if (lx_ok.any() or rx_ok.any()) else 0.0
+        span = max(min_val - background, 1.0)
+        f_left = np.where(lx_ok, np.clip((edge_left - background) / span, 0, 1), 0)
+        f_right = np.where(rx_ok, np.clip((edge_right - background) / span, 0, 1), 0)
+
+        # Per-row moments: the filled span [left, right] plus the two weighted edge pixels
+        xl = (left + x_min).astype(np.float64)
+        xr = (right + x_min).astype(np.float64)
+        ys = (rows + y_min).astype(np.float64)
+        n = xr - xl + 1
+        sx = (xl + xr) * n / 2
+        sxx = (xr * (xr + 1) * (2 * xr + 1) - (xl - 1) * xl * (2 * xl - 1)) / 6
+        w_row = n + f_left + f_right
+        x_row = sx + f_left * (xl - 1) + f_right * (xr + 1)
+        xx_row = sxx + f_left * (xl - 1) ** 2 + f_right * (xr + 1) ** 2
+
+        m00 = w_row.sum()
+        cx = x_row.sum() / m00
+        cy = (w_row * ys).sum() / m00
+        mu20 = xx_row.sum() / m00 - cx ** 2
+        mu02 = (w_row * ys ** 2).sum() / m00 - cy ** 2
+        mu11 = (x_row * ys).sum() / m00 - cx * cy
 
-        # Corners
-        self.corners = {
-            "top_left": (x_min, y_min),
-            "top_right": (x_max, y_min),
-            "bottom_right": (x_max, y_max),
-            "bottom_left": (x_min, y_max),
+        # A square tile has isotropic second moments at any rotation, and its
+        # centroid sits at the middle of its bounding box
+        spread = mu20 + mu02
+        isotropy = 1 - np.sqrt((mu20 - mu02) ** 2 + 4 * mu11 ** 2) / spread if spread > 0 else 0.0
+        size = max(x_max - x_min + 1, y_max - y_min + 1)
+        offset = np.hypot(cx - (x_min + x_max) / 2, cy - (y_min + y_max) / 2)
+        symmetry = max(0.0, 1 - offset / (0.1 * size))
+        confidence = float(max(0.0, isotropy) * symmetry)
+        center = (float(cx), float(cy))
+
+        ring = None
+        if fit_ring:
+            ring = self._fit_center_ring(center, size)
+            if ring is None:
+                confidence = 0.0
+            else:
+                agreement = max(0.0, 1 - np.hypot(ring["center"][0] - cx, ring["center"][1] - cy)
+                                / ring["radius"])
+                confidence *= ring["quality"] * agreement
+
+        self.centroid = {
+            "center": (round(center[0], 3), round(center[1], 3)),
+            "confidence": round(float(confidence), 3),
+            "ring": ring,
         }
+        return self.centroid
 
-        # Midpoints of diagonals
-        mid1 = (ceil((x_min + x_max) / 2), ceil((y_min + y_max) / 2))  # TL to BR
-        mid2 = (ceil((x_max + x_min) / 2), ceil((y_min + y_max) / 2))  # TR to BL
-        self.midpoints = {"diag1": mid1, "diag2": mid2}
+    def _fit_center_ring(self, center, size, rays=32):
+        """Least-squares circle through the edge of the black dot around center."""
+        cx, cy = center
+        height, width = self.mask.shape
+        if not (0 <= round(cy) < height and 0 <= round(cx) < width) or self.mask[round(cy), round(cx)]:
+            return None  # the centroid should sit on the dark central dot
 
-        # Final averaged center
-        self.center = ((mid1[0] + mid2[0]) / 2, (mid1[1] + mid2[1]) / 2)
-        return self.center
+        # March along rays from the centroid to the first white pixel
+        theta = np.linspace(0, 2 * np.pi, rays, endpoint=False)
+        radii = np.arange(0.5, max(size * 0.25, 2), 0.5)
+        px = np.rint(cx + np.outer(np.cos(theta), radii)).astype(int)
+        py = np.rint(cy + np.outer(np.sin(theta), radii)).astype(int)
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        hit = np.zeros(px.shape, dtype=bool)
+        hit[inside] = self.mask[py[inside], px[inside]]
+        found = hit.any(axis=1)
+        if found.sum() < rays // 2:
+            return None
+        r_edge = radii[np.argmax(hit, axis=1)][found] - 0.25
+        ex = cx + np.cos(theta[found]) * r_edge
+        ey = cy + np.sin(theta[found]) * r_edge
+
+        # Algebraic (Kasa) circle fit: x^2 + y^2 = a x + b y + c
+        A = np.column_stack([ex, ey, np.ones_like(ex)])
+        a, b, c = np.linalg.lstsq(A, ex ** 2 + ey ** 2, rcond=None)[0]
+        rx, ry = a / 2, b / 2
+        radius = np.sqrt(max(c + rx ** 2 + ry ** 2, 0.0))
+        if radius <= 0:
+            return None
+        rms = float(np.sqrt(np.mean((np.hypot(ex - rx, ey - ry) - radius) ** 2)))
+        return {
+            "center": (round(float(rx), 3), round(float(ry), 3)),
+            "radius": round(float(radius), 3),
+            "rms": round(rms, 3),
+            "quality": round(max(0.0, 1 - rms / (0.1 * float(radius))), 3),
+        }
 
     def print_summary(self):
         if not self.center:
@@ -78,6 +337,77 @@ class AgProjectGCPDetector:
 
         print(f"\nAveraged center point: {self.center}")
 
+class AgProjectGCPTracker:
+    """
+    Follows one GCP across consecutive frames. After a detection, the next
+    frame is only searched inside the last bounding box padded by `pad`
+    pixels; if the target is not found there (or runs off the edge of the
+    search window) the whole frame is scanned again.
+    """
+
+    def __init__(self, pad=64, min_val=240, max_val=255):
+        self.pad = pad
+        self.min_val = min_val
+        self.max_val = max_val
+        self.extent = None  # (x_min, x_max, y_min, y_max) of the last detection
+        self.corners = {}
+        self.midpoints = {}
+        self.center = None
+        self.last_mode = None
+        self.roi_hits = 0
+        self.full_scans = 0
+
+    def reset(self):
+        self.extent = None
+        self.center = None
+
+    def _scan(self, img_np):
+        mask = AgProjectGCPDetector.white_mask(img_np, self.min_val, self.max_val)
+        return AgProjectGCPDetector.mask_extent(mask)
+
+    def _scan_roi(self, img_np):
+        height, width = img_np.shape[:2]
+        x_min, x_max, y_min, y_max = self.extent
+        x0, x1 = max(x_min - self.pad, 0), min(x_max + self.pad + 1, width)
+        y0, y1 = max(y_min - self.pad, 0), min(y_max + self.pad + 1, height)
+
+        found = self._scan(img_np[y0:y1, x0:x1])
+        if found is None:
+            return None
+        fx_min, fx_max, fy_min, fy_max = found
+
+        # Touching a window edge that isn't the frame edge means the target
+        # may continue outside the window, so the extent can't be trusted
+        if ((fx_min == 0 and x0 > 0) or (fx_max == x1 - x0 - 1 and x1 < width) or
+                (fy_min == 0 and y0 > 0) or (fy_max == y1 - y0 - 1 and y1 < height)):
+            return None
+        return fx_min + x0, fx_max + x0, fy_min + y0, fy_max + y0
+
+    def update(self, image):
+        """Detect the GCP in the next frame (path, PIL image or RGB array)."""
+        img_np = to_rgb_array(image)
+
+        extent = None
+        if self.extent is not None:
+            extent = self._scan_roi(img_np)
+            if extent is not None:
+                self.roi_hits += 1
+                self.last_mode = "roi"
+
+        if extent is None:
+            extent = self._scan(img_np)
+            self.full_scans += 1
+            self.last_mode = "full"
+
+        if extent is None:
+            self.reset()
+            return None
+
+        self.extent = extent
+        self.corners, self.midpoints, self.center = extent_geometry(*extent)
+        return self.center
+
+
 # === Example usage ===
 if __name__ == "__main__":
     detector = AgProjectGCPDetector("AP_getCam.png")
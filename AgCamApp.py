@@ -1,12 +1,13 @@
 import os
 import time
-import json
 import threading
 from datetime import datetime
-from flask import Flask, render_template, redirect, url_for, send_from_directory, jsonify
-from picamera2 import Picamera2
-import imageio
+from flask import Flask, render_template, redirect, url_for, send_from_directory, jsonify, request
+import argparse
 import numpy as np
+from stats_store import StatsStore
+from camera import open_camera, add_camera_arguments, camera_from_args, ReplayExhausted
+from sse import sse_message, sse_keepalive, sse_response, last_event_id, KEEPALIVE_S
 
 app = Flask(__name__)
 
@@ -14,21 +15,27 @@ output_folder = "AgLabImages"
 os.makedirs(output_folder, exist_ok=True)
 
 initial_timestamp = datetime.now().strftime("%d-%b-%y-%H-%M-%S")
-stats_output_file = f"AgLabImageStats_{initial_timestamp}.json"
-with open(stats_output_file, "w") as f:
-    json.dump([], f)
+stats_output_file = f"AgLabImageStats_{initial_timestamp}.jsonl"
+stats_store = StatsStore(stats_output_file)
+STATS_PAGE_LIMIT = 100
+STATS_PAGE_MAX = 1000
 
 capturing = False
 capture_thread = None
 latest_image = None
 latest_info = None
 processor = None
+camera_args = None  # parsed camera arguments, set from the command line; None means the Pi camera
+stats_options = {}  # histogram / percentiles for ImageCaptureProcessor, from the command line
 
 class ImageCaptureProcessor:
-    def __init__(self):
-        self.picam2 = Picamera2()
-        self.picam2.configure(self.picam2.create_still_configuration(main={"size": (1920, 1080)}))
-        self.picam2.start()
+    def __init__(self, histogram=False, percentiles=()):
+        self.histogram = histogram
+        self.percentiles = percentiles
+        if camera_args is None:
+            self.camera = open_camera(size=(1920, 1080), warmup_s=0)
+        else:
+            self.camera = camera_from_args(camera_args, size=(1920, 1080), warmup_s=0)
 
     def capture_and_process(self):
         global latest_image, latest_info, capturing
@@ -36,70 +43,86 @@ class ImageCaptureProcessor:
             ts = datetime.now().strftime("%d-%b-%y-%H-%M-%S")
             filename = f"agLab_{ts}.png"
             filepath = os.path.join(output_folder, filename)
-            self.picam2.capture_file(filepath)
-            print(f"[✓] Captured {filename}")
+            # Same pixels capture_file would write, but kept in memory for the stats
+            try:
+                image = self.camera.capture_image()
+            except ReplayExhausted:
+                capturing = False
+                break
+            stats = self.get_image_stats(np.asarray(image), filename)
+            image.save(filepath)
+            print(f"[✓] Captured {filename} ({self.camera.latency.last_ms:.0f} ms)")
 
-            stats = self.get_image_stats(filepath)
             latest_image = filename
             latest_info = stats
 
-            with open(stats_output_file, "r+") as f:
-                data = json.load(f)
-                data.append(stats)
-                f.seek(0)
-                json.dump(data, f, indent=2)
-                f.truncate()
+            stats_store.append(stats)
 
             time.sleep(5)
 
-    def get_image_stats(self, image_path):
-        image = imageio.imread(image_path)
+    def get_image_stats(self, image, image_name):
         height, width = image.shape[:2]
         num_channels = 1 if image.ndim == 2 else image.shape[2]
-        channel_stats = {}
 
-        if num_channels == 1:
-            channel_stats["0"] = self._stats_for_channel(image)
-        else:
-            for i in range(num_channels):
-                channel = image[:, :, i]
-                channel_stats[str(i)] = self._stats_for_channel(channel)
+        # One channel-planar copy, then every reduction runs over contiguous memory
+        planes = np.ascontiguousarray(
+            np.moveaxis(image.reshape(height, width, num_channels), 2, 0)
+        ).reshape(num_channels, -1)
+        sum_dtype = np.uint64 if np.issubdtype(planes.dtype, np.integer) else np.float64
+        mins = planes.min(axis=1)
+        maxs = planes.max(axis=1)
+        means = planes.sum(axis=1, dtype=sum_dtype) / planes.shape[1]
 
         stats = {
-            "image_name": os.path.basename(image_path),
+            "image_name": image_name,
             "dimensions": f"{height} x {width}",
             "num_channels": num_channels
         }
 
-        for ch, vals in channel_stats.items():
-            stats[f"channel_{ch}_min"] = vals["min"]
-            stats[f"channel_{ch}_max"] = vals["max"]
-            stats[f"channel_{ch}_mean"] = vals["mean"]
+        for ch in range(num_channels):
+            stats[f"channel_{ch}_min"] = int(mins[ch])
+            stats[f"channel_{ch}_max"] = int(maxs[ch])
+            stats[f"channel_{ch}_mean"] = round(float(means[ch]), 2)
+
+        if self.histogram or self.percentiles:
+            self._add_distribution_stats(stats, planes)
 
         return stats
 
-    def _stats_for_channel(self, data):
-        return {
-            "min": int(np.min(data)),
-            "max": int(np.max(data)),
-            "mean": round(float(np.mean(data)), 2)
-        }
+    def _add_distribution_stats(self, stats, planes):
+        # Percentiles are nearest-rank for every dtype: the smallest value with
+        # at least q% of pixels at or below it, so a uint8 frame and its float
+        # copy report the same p-values (np.partition, so any numpy version)
+        n = planes.shape[1]
+        ranks = [max(int(np.ceil(q / 100 * n)), 1) - 1 for q in self.percentiles]
+        for ch, plane in enumerate(planes):
+            if plane.dtype == np.uint8:
+                hist = np.bincount(plane, minlength=256)
+                cdf = np.cumsum(hist)
+                values = [int(np.searchsorted(cdf, k + 1)) for k in ranks]
+            else:
+                hist = np.histogram(plane, bins=256)[0]
+                ordered = np.partition(plane, ranks) if ranks else plane
+                values = [float(ordered[k]) for k in ranks]
+
+            if self.histogram:
+                stats[f"channel_{ch}_hist"] = hist.tolist()
+            for q, v in zip(self.percentiles, values):
+                stats[f"channel_{ch}_p{q:g}"] = v
 
     def close(self):
-        self.picam2.close()
+        self.camera.close()
 
 @app.route("/")
 def index():
-    with open(stats_output_file, "r") as f:
-        data = json.load(f)
-    return render_template("index.html", capturing=capturing, latest_image=latest_image, latest_info=latest_info, all_stats=data)
+    return render_template("index.html", capturing=capturing, latest_image=latest_image, latest_info=latest_info, all_stats=stats_store.records())
 
 @app.route("/toggle")
 def toggle_capture():
     global capturing, capture_thread, processor
     if not capturing:
         capturing = True
-        processor = ImageCaptureProcessor()
+        processor = ImageCaptureProcessor(**stats_options)
         capture_thread = threading.Thread(target=processor.capture_and_process)
         capture_thread.start()
     else:
@@ -117,13 +140,54 @@ def latest():
 
 @app.route("/stats")
 def stats():
-    with open(stats_output_file, "r") as f:
-        data = json.load(f)
-    return jsonify(data)
+    # /stats                  -> the latest page, plus a cursor
+    # /stats?since=<seq>      -> only records added after seq (use the returned cursor)
+    # A cursor ahead of the store (kept from before a server restart) gets the
+    # latest page again with reset=true, so the client drops what it had
+    limit = min(max(request.args.get("limit", STATS_PAGE_LIMIT, type=int), 1), STATS_PAGE_MAX)
+    since = request.args.get("since", type=int)
+    reset = since is not None and since > stats_store.count
+    records = stats_store.tail(limit) if since is None or reset else stats_store.since(since, limit)
+    if records:
+        cursor = records[-1]["seq"]
+    else:
+        cursor = stats_store.count if since is None or reset else since
+    return jsonify({"records": records, "cursor": cursor, "more": cursor < stats_store.count,
+                    "reset": reset})
+
+@app.route("/events")
+def events():
+    # Pushes each new stats record as it is stored; the id is its seq, so a
+    # reconnecting browser resumes from Last-Event-ID without gaps
+    def stream(cursor):
+        if cursor > stats_store.count:
+            # Id from before a server restart: waiting on it would never wake,
+            # so send a reset and let the page reload its snapshot from /stats
+            cursor = stats_store.count
+            yield sse_message({"cursor": cursor}, event="reset", event_id=cursor)
+        while True:
+            latest = stats_store.wait_for_new(cursor, timeout=KEEPALIVE_S)
+            if latest <= cursor:
+                yield sse_keepalive()
+                continue
+            for record in stats_store.since(cursor, STATS_PAGE_LIMIT):
+                yield sse_message(record, event="stats", event_id=record["seq"])
+                cursor = record["seq"]
+
+    return sse_response(stream(last_event_id(request, default=stats_store.count)))
 
 @app.route('/images/<filename>')
 def send_image(filename):
     return send_from_directory(output_folder, filename)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgLab camera dashboard.")
+    parser.add_argument("--histogram", action="store_true",
+                        help="also store a 256-bin histogram per channel with each frame's stats")
+    parser.add_argument("--percentiles", default="", metavar="Q,Q,...",
+                        help="per-channel percentiles to store, e.g. 5,50,95")
+    add_camera_arguments(parser)
+    camera_args = parser.parse_args()
+    stats_options.update(histogram=camera_args.histogram,
+                         percentiles=tuple(float(q) for q in camera_args.percentiles.split(",") if q))
     app.run(host='0.0.0.0', port=5000, debug=False)
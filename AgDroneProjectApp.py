@@ -1,46 +1,54 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, render_template, request, redirect, url_for, Response, abort
 from threading import Thread, Event
 import time
-import os
 
-from AP_getCam import AgProjectGCPPlacer
+import numpy as np
+from PIL import Image
+
+from AP_getCam import AgProjectGCPGenerator
 from AP_model import AgProjectGCPDetector
+from frame_buffer import FrameBuffer
+from sse import sse_message, sse_keepalive, sse_response, last_event_id, KEEPALIVE_S
 
 app = Flask(__name__)
-os.makedirs("static", exist_ok=True)
 
 output_info = {}
 running_event = Event()
 worker_thread = None
 
-import shutil
+# Latest placed/filtered images live in memory and are served by /frames/<name>
+frames = FrameBuffer(formats={"filtered": "PNG"})
 
 def gcp_loop():
+    # Decoded once; rotated/scaled overlays are cached across iterations
+    generator = AgProjectGCPGenerator("BaseGreenField.png", "gcp_singleRing_fixed_pattern.png",
+                                      max_scale=0.12)
     while running_event.is_set():
-        placer = AgProjectGCPPlacer("BaseGreenField.png", "gcp_singleRing_fixed_pattern.png")
-        placer.apply_random_transform()
-        placer.place_overlay()
-        placer.save_result("static/tmp_AP_getCam.png")  # save to temp
-
-        output_info["scale"] = round(placer.scale_factor, 4)
-        output_info["angle"] = round(placer.angle, 2)
-        output_info["position"] = placer.center_position
-
-        detector = AgProjectGCPDetector("static/tmp_AP_getCam.png")
-        detector.filter_white_pixels()
-        detector.save_filtered_image("static/tmp_AP_model_output.png")  # save to temp
-        output_info["gcp_center"] = detector.find_center()
-
-        # Atomically replace both images
-        shutil.move("static/tmp_AP_getCam.png", "static/AP_getCam.png")
-        shutil.move("static/tmp_AP_model_output.png", "static/AP_model_output.png")
+        frame, placed = generator.generate()
+
+        # The detector works on the in-memory frame, no PNG save/reload
+        detector = AgProjectGCPDetector(frame)
+        detector.filter_white_pixels(fast=True)
+        info = {
+            "scale": round(placed["scale"], 4),
+            "angle": round(placed["angle"], 2),
+            "position": placed["center_position"],
+            "gcp_center": detector.find_center(),
+        }
+
+        # Both images and their info switch to the new version together; the
+        # filtered view is only rendered from the mask if someone requests it
+        mask = detector.mask
+        info["version"] = frames.publish(
+            {"placed": frame, "filtered": lambda: Image.fromarray(mask.view(np.uint8) * 255)}, info)
+        output_info.update(info)
 
         time.sleep(5)
 
 
 @app.route("/", methods=["GET", "POST"])
 def index():
-    global worker_threadpyth
+    global worker_thread
 
     if request.method == "POST":
         action = request.form.get("action")
@@ -57,7 +65,40 @@ def index():
 
         return redirect(url_for("index"))
 
-    return render_template("index.html", info=output_info, running=running_event.is_set())
+    return render_template("index_AgDroneProjectApp.html", info=output_info, running=running_event.is_set())
+
+@app.route("/frames/<name>")
+def frame(name):
+    found = frames.get(name)
+    if found is None:
+        abort(404)
+    version, data, mimetype = found
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(str(version))
+    # Pages request ?v=<version>; once that matches, the URL never changes content
+    response.cache_control.max_age = 3600 if request.args.get("v") == str(version) else 0
+    # 304 Not Modified when the browser already has this version (If-None-Match)
+    return response.make_conditional(request)
+
+@app.route("/events")
+def events():
+    # One message per published version; the page swaps text and image URLs in place
+    def stream(version):
+        if version > frames.version:
+            # Id from before a server restart: waiting on it would never wake,
+            # so start over from the current snapshot
+            version = frames.version
+            if version:
+                yield sse_message(dict(frames.info or {}, version=version), event="detection", event_id=version)
+        while True:
+            current = frames.wait_for_change(version, timeout=KEEPALIVE_S)
+            if current <= version:
+                yield sse_keepalive()
+                continue
+            version = current
+            yield sse_message(dict(frames.info or {}, version=version), event="detection", event_id=version)
+
+    return sse_response(stream(last_event_id(request, default=frames.version)))
 
 if __name__ == "__main__":
     app.run(debug=True)
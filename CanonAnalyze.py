@@ -1,13 +1,13 @@
 import os
 import time
-import re
-import tempfile
 from datetime import datetime
 from pathlib import Path
-import subprocess
-import numpy as np
-from PIL import Image
-from ultralytics import YOLO
+import argparse
+from gcp_detection import GCPDetectionEngine, log_detection
+from frame_pipeline import Pipeline, BLOCK, BACKPRESSURE_POLICIES
+from frame_sequence import FrameSequence
+from structured_log import StructuredLog
+from camera import CameraBusy, CameraError, ReplayExhausted, add_camera_arguments, camera_from_args
 
 # =============================================================================
 # CONFIGURATION
@@ -22,161 +22,181 @@ LOG_DIR = "LogFiles"
 # =============================================================================
 os.makedirs(LOG_DIR, exist_ok=True)
 timestamp_str = datetime.now().strftime("%d-%b-%y_%H_%M_%S")
-LOG_FILE = f"{LOG_DIR}/Log_{timestamp_str}.txt"
-
-def append_log(message: str):
-    with open(LOG_FILE, "a") as f:
-        f.write(message + "\n")
+# One JSON record per frame and stage (see structured_log.py), written off-thread
+LOG_FILE = f"{LOG_DIR}/Log_{timestamp_str}.jsonl"
+log = StructuredLog(LOG_FILE)
 
 def ensure_output_dir():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def get_latest_image_number():
-    """Find highest output####.JPG number in OUTPUT_DIR."""
-    files = os.listdir(OUTPUT_DIR)
-    numbers = []
-    for f in files:
-        m = re.match(r"output(\d{4})\.(jpg|jpeg|JPG|JPEG)$", f)
-        if m:
-            numbers.append(int(m.group(1)))
-    return max(numbers) if numbers else 0
+# =============================================================================
+# GCP detection (shared helpers in gcp_detection.py)
+# =============================================================================
+def test_gcp_detection(image_path, engine):
+    t0 = time.perf_counter()
+    result = engine.detect_path(image_path)
+    duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+    log_detection(Path(image_path).name, result.detected)
+    log.log("inference", frame=Path(image_path).stem, duration_ms=duration_ms,
+            detected=result.detected, conf=result.conf, count=result.count)
+    return result.detected
 
 # =============================================================================
-# Image loading for YOLO (kept from your pipeline)
+# Capture (busy/retry handled here, so callers only see success or a fatal error)
 # =============================================================================
-def load_image(image_path, channel=2):
-    arr = np.array(Image.open(image_path))
-    if arr.ndim == 3 and arr.shape[2] > channel:
-        channel_data = arr[:, :, channel]
-    elif arr.ndim == 2:
-        channel_data = arr
-    else:
-        channel_data = arr[:, :, -1] if arr.ndim == 3 else arr
-
-    if channel_data.dtype != np.uint8:
-        channel_data = ((channel_data - channel_data.min()) /
-                        (channel_data.max() - channel_data.min()) * 255).astype(np.uint8)
-    return np.stack([channel_data] * 3, axis=2)
-
-def log_to_file(image_name, detected):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    result = "Yes" if detected else "No"
-    line = f"[{timestamp}] Image: {image_name} | GCP detected: {result}"
-    print(line)
-    append_log(line)
-
-def test_gcp_detection(image_path, model, channel=2):
-    image = load_image(image_path, channel)
-    temp_path = tempfile.mktemp(suffix=".jpg")
-    Image.fromarray(image).save(temp_path, 'JPEG', quality=95)
+def log_line(message, stage=None, **fields):
+    """Print the message; with a stage, also record the fields in the structured log."""
+    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{ts}] {message}")
+    if stage:
+        log.log(stage, **fields)
+
+def capture_with_retry(camera, image_path):
+    """Capture to image_path, retrying once if the camera is busy. Returns False on failure."""
+    frame = Path(image_path).stem
     try:
-        for conf in [0.25, 0.1, 0.05, 0.01]:
-            results = model(temp_path, conf=conf, verbose=False)
-            detections = results[0].boxes
-            if detections is not None and len(detections) > 0:
-                log_to_file(Path(image_path).name, True)
-                return True
-        log_to_file(Path(image_path).name, False)
-        return False
-    finally:
-        Path(temp_path).unlink(missing_ok=True)
+        camera.capture_file(image_path, wait_s=8)
+        return True
+    except CameraBusy as e:
+        print("⚠️ Camera busy; waiting 4s and retrying…")
+        log.log("capture", frame=frame, event="busy_retry", error=str(e))
+        time.sleep(4)
+        try:
+            camera.capture_file(image_path, wait_s=10)
+            return True
+        except CameraError as e:
+            err = f"Capture failed after retry: {e}"
+    except CameraError as e:
+        err = f"Capture failed: {e}"
+    print("❌ " + err)
+    log.log("capture", frame=frame, event="failed", error=err)
+    return False
 
 # =============================================================================
-# gphoto2 camera control (Canon USB)
+# Main Loop
 # =============================================================================
-def run_cmd(args):
-    return subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-def prime_camera():
-    # Avoid desktop auto-mounter grabbing the camera; harmless if not running
-    run_cmd(["killall", "gvfs-gphoto2-volume-monitor"])
-    run_cmd(["killall", "gvfsd-gphoto2"])
-    # Save to SD card (more reliable)
-    run_cmd(["gphoto2", "--set-config", "capturetarget=1"])
-    # (Optional) If you still see “reviewtime 2s” in logs, you can force it off:
-    # run_cmd(["gphoto2", "--set-config", "reviewtime=0"])
-
-def capture_one_jpeg(output_path, wait_s=8):
-    """
-    Trigger shutter, wait for camera to report the new object, download to output_path.
-    Returns (ok: bool, info: str)
-    """
-    r1 = run_cmd(["gphoto2", "--trigger-capture"])
-    if r1.returncode != 0:
-        return False, f"trigger failed: {r1.stderr.strip()}"
-
-    r2 = run_cmd([
-        "gphoto2",
-        f"--wait-event-and-download={wait_s}s",
-        f"--filename={output_path}",
-        "--force-overwrite"
-    ])
-    if r2.returncode != 0:
-        return False, r2.stderr.strip()
-    return True, r2.stdout.strip()
+def run_serial(camera, engine, interval, sequence):
+    while True:
+        image_path = sequence.next_path("JPG")
+        frame = Path(image_path).stem
+        t0 = time.perf_counter()
+
+        log_line(f"Capturing: {image_path}")
+        if not capture_with_retry(camera, image_path):
+            break
+        capture_ms = round(camera.latency.last_ms, 1)
+        log_line(f"Captured: {image_path} ({capture_ms:.0f} ms)",
+                 "capture", frame=frame, path=image_path, duration_ms=capture_ms)
+
+        # Run your detector
+        test_gcp_detection(image_path, engine)
+
+        frame_ms = round((time.perf_counter() - t0) * 1000, 1)
+        log_line(f"Processed: {image_path}", "frame", frame=frame, duration_ms=frame_ms)
+
+        print("-" * 40)
+
+        time.sleep(interval)  # small settle delay for next loop
 
 # =============================================================================
-# Main Loop
+# Concurrent Loop: the camera shoots and downloads while the last frame is analyzed
 # =============================================================================
+def run_concurrent(camera, engine, interval, queue_size, backpressure, sequence):
+    last_trigger = [0.0]
+
+    def capture():
+        wait = last_trigger[0] + interval - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        last_trigger[0] = time.perf_counter()
+        image_path = sequence.next_path("JPG")
+        try:
+            ok = capture_with_retry(camera, image_path)
+        except ReplayExhausted:
+            return None
+        if not ok:
+            return None  # fatal: stop the pipeline, queued frames still drain
+        capture_ms = round(camera.latency.last_ms, 1)
+        log_line(f"Captured: {image_path} ({capture_ms:.0f} ms)",
+                 "capture", frame=Path(image_path).stem, path=image_path, duration_ms=capture_ms)
+        return {"path": image_path,
+                "capture_ms": camera.latency.last_ms,
+                "queued_at": time.perf_counter()}
+
+    def inference(frame):
+        image_path = frame["path"]
+        wait_ms = round((time.perf_counter() - frame["queued_at"]) * 1000, 1)
+        t0 = time.perf_counter()
+        test_gcp_detection(image_path, engine)
+        infer_ms = (time.perf_counter() - t0) * 1000
+        log_line(f"Processed: {image_path} | capture {frame['capture_ms']:.0f} ms"
+                 f" | queued {wait_ms:.0f} ms | inference {infer_ms:.0f} ms",
+                 "queue", frame=Path(image_path).stem, duration_ms=wait_ms)
+        return frame
+
+    def dropped(frame):
+        # The camera already wrote the file; it is kept but never analyzed
+        log_line(f"Dropped (not analyzed): {frame['path']}",
+                 "dropped", frame=Path(frame["path"]).stem, path=frame["path"])
+
+    pipeline = Pipeline(capture, [("inference", inference)],
+                        maxsize=queue_size, policy=backpressure, on_drop=dropped)
+    pipeline.start()
+    try:
+        while pipeline.is_alive():
+            pipeline.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\nStopping capture, finishing queued frames…")
+        pipeline.stop()
+        pipeline.join()
+
+    summary = pipeline.summary()
+    print(summary)
+    log.log("summary", **summary)
+
 def main():
+    parser = argparse.ArgumentParser(description="Capture from a Canon over USB and run GCP detection.")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="keep capturing while the previous frame is analyzed")
+    parser.add_argument("--backpressure", choices=BACKPRESSURE_POLICIES, default=BLOCK,
+                        help="when inference falls behind: block capture or drop the oldest frame")
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=None,
+                        help=f"seconds between shots (default {CAPTURE_INTERVAL}, 0 when concurrent)")
+    add_camera_arguments(parser, default="gphoto2")
+    args = parser.parse_args()
+
     ensure_output_dir()
 
     if not Path(MODEL_PATH).exists():
         print(f"Model not found: {MODEL_PATH}")
         return
 
-    model = YOLO(MODEL_PATH)
-    prime_camera()
-
-    image_counter = get_latest_image_number() + 1
+    engine = GCPDetectionEngine(MODEL_PATH)
+    # gphoto2: stops the desktop auto-mounter and saves to the SD card
+    camera = camera_from_args(args, size=None)
+    sequence = FrameSequence(OUTPUT_DIR)
 
     print("📸 Canon capture started. Press Ctrl+C to stop.")
-    append_log("=== Canon USB capture session started ===")
+    log.log("session", event="start", camera=camera.name, concurrent=args.concurrent)
 
     try:
-        while True:
-            filename = f"output{image_counter:04d}.JPG"
-            image_path = os.path.join(OUTPUT_DIR, filename)
-
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            msg = f"[{ts}] Capturing: {image_path}"
-            print(msg); append_log(msg)
-
-            ok, info = capture_one_jpeg(image_path, wait_s=8)
-            if not ok:
-                if "PTP Device Busy" in info or "I/O in progress" in info:
-                    print("⚠️ Camera busy; waiting 4s and retrying…")
-                    append_log("Busy; retrying after 4s")
-                    time.sleep(4)
-                    ok2, info2 = capture_one_jpeg(image_path, wait_s=10)
-                    if not ok2:
-                        err = f"Capture failed after retry: {info2}"
-                        print("❌ " + err); append_log("ERROR " + err)
-                        break
-                else:
-                    err = f"Capture failed: {info}"
-                    print("❌ " + err); append_log("ERROR " + err)
-                    break
-
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            msg = f"[{ts}] Captured: {image_path}"
-            print(msg); append_log(msg)
-
-            # Run your detector
-            test_gcp_detection(image_path, model)
-
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            msg = f"[{ts}] Processed: {image_path}"
-            print(msg); append_log(msg)
-
-            print("-" * 40); append_log("-" * 40); append_log("")
-
-            image_counter += 1
-            time.sleep(CAPTURE_INTERVAL)  # small settle delay for next loop
-
-    except KeyboardInterrupt:
+        if args.concurrent:
+            interval = 0 if args.interval is None else args.interval
+            run_concurrent(camera, engine, interval, args.queue_size, args.backpressure, sequence)
+        else:
+            interval = CAPTURE_INTERVAL if args.interval is None else args.interval
+            run_serial(camera, engine, interval, sequence)
+    except (KeyboardInterrupt, ReplayExhausted):
         print("\n🛑 Stopped by user.")
-        append_log("=== Session stopped by user ===")
+        log.log("session", event="stop")
+    finally:
+        camera.close()
+        sequence.close()
+        latency = camera.latency.summary()
+        print(f"Capture latency ({camera.name}): {latency}")
+        log.log("capture_latency", backend=camera.name, **latency)
+        log.close()
 
 if __name__ == "__main__":
     main()
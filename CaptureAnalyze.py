@@ -1,13 +1,14 @@
 import os
 import time
-import re
-import tempfile
+import argparse
 from datetime import datetime
 from pathlib import Path
 import numpy as np
-from PIL import Image
-from ultralytics import YOLO
-from picamera2 import Picamera2
+from gcp_detection import GCPDetectionEngine, log_detection, prepare_image
+from frame_pipeline import Pipeline, BLOCK, BACKPRESSURE_POLICIES
+from camera import add_camera_arguments, camera_from_args, ReplayExhausted
+from frame_sequence import FrameSequence
+from structured_log import StructuredLog
 
 
 # =============================================================================
@@ -18,10 +19,12 @@ from datetime import datetime
 OUTPUT_DIR = "OutputImages"
 MODEL_PATH = "best.pt"
 
-# Ensure LogFiles directory exists and generate timestamped log filename
+# Ensure LogFiles directory exists and generate timestamped log filename.
+# One JSON record per frame and stage (see structured_log.py), written off-thread.
 os.makedirs("LogFiles", exist_ok=True)
 timestamp_str = datetime.now().strftime("%d-%b-%y_%H_%M_%S")
-LOG_FILE = f"LogFiles/Log_{timestamp_str}.txt"
+LOG_FILE = f"LogFiles/Log_{timestamp_str}.jsonl"
+log = StructuredLog(LOG_FILE)
 
 CAPTURE_INTERVAL = 1  # seconds
 
@@ -32,114 +35,166 @@ CAPTURE_INTERVAL = 1  # seconds
 def ensure_output_dir():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def get_latest_image_number():
-    files = os.listdir(OUTPUT_DIR)
-    numbers = []
+def ms_since(t0):
+    return round((time.perf_counter() - t0) * 1000, 1)
 
-    for f in files:
-        m = re.match(r"output(\d{4})\.png", f)
-        if m:
-            numbers.append(int(m.group(1)))
+def log_result(image_path, result, duration_ms):
+    log_detection(Path(image_path).name, result.detected)
+    log.log("inference", frame=Path(image_path).stem, duration_ms=duration_ms,
+            detected=result.detected, conf=result.conf, count=result.count)
 
-    return max(numbers) if numbers else 0
+def test_gcp_detection(image_path, engine):
+    t0 = time.perf_counter()
+    result = engine.detect_path(image_path)
+    log_result(image_path, result, ms_since(t0))
+    return result.detected
 
-def load_image(image_path, channel=2):
-    arr = np.array(Image.open(image_path))
-
-    if arr.ndim == 3 and arr.shape[2] > channel:
-        channel_data = arr[:, :, channel]
-    elif arr.ndim == 2:
-        channel_data = arr
-    else:
-        channel_data = arr[:, :, -1] if arr.ndim == 3 else arr
+# =============================================================================
+# Camera
+# =============================================================================
 
-    if channel_data.dtype != np.uint8:
-        channel_data = ((channel_data - channel_data.min()) /
-                        (channel_data.max() - channel_data.min()) * 255).astype(np.uint8)
+CAMERA_SIZE = (1920, 1080)
 
-    return np.stack([channel_data] * 3, axis=2)
+def log_step(label, image_path, stage=None, duration_ms=None, **fields):
+    """Print the step; with a stage, also record it in the structured log."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    msg = f"[{timestamp}] {label}: {image_path}"
+    if duration_ms is not None:
+        msg += f" ({duration_ms:.0f} ms)"
+    print(msg)
+    if stage:
+        log.log(stage, frame=Path(image_path).stem, path=image_path,
+                duration_ms=duration_ms, **fields)
 
-def append_log(message):
-    with open(LOG_FILE, "a") as f:
-        f.write(message + "\n")
+# =============================================================================
+# Main Loop
+# =============================================================================
 
-def log_to_file(image_name, detected):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    result = "Yes" if detected else "No"
-    line = f"[{timestamp}] Image: {image_name} | GCP detected: {result}"
-    print(line)
-    append_log(line)
+def run_serial(camera, engine, interval, sequence):
+    while True:
+        image_path = sequence.next_path("png")
+        t0 = time.perf_counter()
 
-def test_gcp_detection(image_path, model, channel=2):
-    image = load_image(image_path, channel)
-    temp_path = tempfile.mktemp(suffix=".jpg")
-    Image.fromarray(image).save(temp_path, 'JPEG', quality=95)
+        log_step("Capturing", image_path)
+        try:
+            camera.capture_file(image_path)
+        except ReplayExhausted:
+            return
+        log_step("Captured", image_path, stage="capture", duration_ms=round(camera.latency.last_ms, 1))
 
-    try:
-        for conf in [0.25, 0.1, 0.05, 0.01]:
-            results = model(temp_path, conf=conf, verbose=False)
-            detections = results[0].boxes
+        test_gcp_detection(image_path, engine)
 
-            if detections is not None and len(detections) > 0:
-                log_to_file(Path(image_path).name, True)
-                return True
+        log_step("Processed", image_path, stage="frame", duration_ms=ms_since(t0))
 
-        log_to_file(Path(image_path).name, False)
-        return False
+        print("-" * 40)
 
-    finally:
-        Path(temp_path).unlink(missing_ok=True)
+        time.sleep(interval)
 
 # =============================================================================
-# Main Loop
+# Pipelined Loop: capture -> preprocess -> inference -> persist
 # =============================================================================
 
+def run_pipelined(camera, engine, interval, queue_size, backpressure, sequence):
+    """Capture, inference and disk writes each run on their own thread."""
+    last_capture = [0.0]
+
+    def capture():
+        wait = last_capture[0] + interval - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        last_capture[0] = time.perf_counter()
+        t0 = time.perf_counter()
+        try:
+            image = camera.capture_image()
+        except ReplayExhausted:
+            return None
+        image_path = sequence.next_path("png")
+        log.log("capture", frame=Path(image_path).stem, duration_ms=round(camera.latency.last_ms, 1))
+        return {"path": image_path,
+                "image": image,
+                "started": t0,
+                "captured_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+    def preprocess(frame):
+        t0 = time.perf_counter()
+        frame["prepared"] = prepare_image(np.asarray(frame["image"]), engine.channel)
+        log.log("preprocess", frame=Path(frame["path"]).stem, duration_ms=ms_since(t0))
+        return frame
+
+    def inference(frame):
+        t0 = time.perf_counter()
+        frame["result"] = engine.detect_prepared(frame.pop("prepared"))
+        frame["inference_ms"] = ms_since(t0)
+        return frame
+
+    def persist(frame):
+        image_path = frame["path"]
+        t0 = time.perf_counter()
+        frame["image"].save(image_path)
+        log.log("persist", frame=Path(image_path).stem, duration_ms=ms_since(t0))
+        print(f"[{frame['captured_at']}] Captured: {image_path}")
+        log_result(image_path, frame["result"], frame["inference_ms"])
+        log_step("Processed", image_path, stage="frame", duration_ms=ms_since(frame["started"]))
+
+    def dropped(frame):
+        # Its number was allocated at capture; record why the saved files skip it
+        log.log("dropped", frame=Path(frame["path"]).stem)
+
+    pipeline = Pipeline(capture,
+                        [("preprocess", preprocess), ("inference", inference), ("persist", persist)],
+                        maxsize=queue_size, policy=backpressure, on_drop=dropped)
+    pipeline.start()
+    try:
+        while pipeline.is_alive():
+            pipeline.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\nStopping pipeline, draining queued frames…")
+        pipeline.stop()
+        pipeline.join()
+
+    summary = pipeline.summary()
+    print(summary)
+    log.log("summary", **summary)
+
 def main():
+    parser = argparse.ArgumentParser(description="Capture frames and run GCP detection.")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="run capture, inference and disk writes on separate threads")
+    parser.add_argument("--backpressure", choices=BACKPRESSURE_POLICIES, default=BLOCK,
+                        help="when inference falls behind: block capture or drop the oldest frame")
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=None,
+                        help=f"seconds between captures (default {CAPTURE_INTERVAL}, 0 when pipelined)")
+    add_camera_arguments(parser)
+    args = parser.parse_args()
+
     ensure_output_dir()
 
     if not Path(MODEL_PATH).exists():
         print(f"Model not found: {MODEL_PATH}")
         return
 
-    model = YOLO(MODEL_PATH)
-
-    picam2 = Picamera2()
-    config = picam2.create_still_configuration(main={"size": (1920, 1080)})
-    picam2.configure(config)
-    picam2.start()
-    time.sleep(2)
-
-    image_counter = get_latest_image_number() + 1
-
-    while True:
-        filename = f"output{image_counter:04d}.png"
-        image_path = os.path.join(OUTPUT_DIR, filename)
-
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        msg = f"[{timestamp}] Capturing: {image_path}"
-        print(msg)
-        append_log(msg)
-
-        picam2.capture_file(image_path)
+    engine = GCPDetectionEngine(MODEL_PATH)
+    camera = camera_from_args(args, size=CAMERA_SIZE)
+    sequence = FrameSequence(OUTPUT_DIR)
+    log.log("session", event="start", camera=camera.name, pipelined=args.pipelined)
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        msg = f"[{timestamp}] Captured: {image_path}"
-        print(msg)
-        append_log(msg)
-
-        test_gcp_detection(image_path, model)
-
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        msg = f"[{timestamp}] Processed: {image_path}"
-        print(msg)
-        append_log(msg)
-
-        print("-" * 40)
-        append_log("-" * 40)
-        append_log("")  # blank line
-
-        image_counter += 1
-        time.sleep(CAPTURE_INTERVAL)
+    try:
+        if args.pipelined:
+            interval = 0 if args.interval is None else args.interval
+            run_pipelined(camera, engine, interval, args.queue_size, args.backpressure, sequence)
+        else:
+            interval = CAPTURE_INTERVAL if args.interval is None else args.interval
+            run_serial(camera, engine, interval, sequence)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped by user.")
+    finally:
+        camera.close()
+        sequence.close()
+        latency = camera.latency.summary()
+        print(f"Capture latency ({camera.name}): {latency}")
+        log.log("capture_latency", backend=camera.name, **latency)
+        log.close()
 
 if __name__ == "__main__":
     main()
@@ -1,43 +1,32 @@
-import os
 import time
-import re
-from picamera2 import Picamera2
+import argparse
+from camera import open_camera, add_camera_arguments, camera_from_args, ReplayExhausted
+from frame_sequence import FrameSequence
 
 class SimplePiCam:
-    def __init__(self, output_dir="OutputImages"):
+    def __init__(self, output_dir="OutputImages", camera=None):
         self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
-        self.image_number = self._get_next_image_number()
+        self.sequence = FrameSequence(output_dir)
 
-        self.picam2 = Picamera2()
-        config = self.picam2.create_still_configuration(main={"size": (1920, 1080)})
-        self.picam2.configure(config)
-        self.picam2.start()
-
-    def _get_next_image_number(self):
-        files = os.listdir(self.output_dir)
-        image_numbers = []
-
-        for f in files:
-            match = re.match(r"output(\d{4})\.png", f)
-            if match:
-                image_numbers.append(int(match.group(1)))
-
-        if image_numbers:
-            return max(image_numbers) + 1
-        else:
-            return 0
+        self.camera = camera or open_camera("picamera", size=(1920, 1080))
 
     def capture_image(self):
-        filename = f"output{self.image_number:04d}.png"
-        full_path = os.path.join(self.output_dir, filename)
-        self.picam2.capture_file(full_path)
-        print(f"Image saved as {full_path}")
-        self.image_number += 1
+        full_path = self.sequence.next_path("png")
+        self.camera.capture_file(full_path)
+        print(f"Image saved as {full_path} ({self.camera.latency.last_ms:.0f} ms)")
 
 # --- Run forever, every 5 seconds ---
 if __name__ == "__main__":
-    cam = SimplePiCam()
-    while True:
-        cam.capture_image()
-        time.sleep(5)
+    parser = argparse.ArgumentParser(description="Capture an image every 5 seconds.")
+    add_camera_arguments(parser)
+    args = parser.parse_args()
+    cam = SimplePiCam(camera=camera_from_args(args, size=(1920, 1080)))
+    try:
+        while True:
+            cam.capture_image()
+            time.sleep(5)
+    except (KeyboardInterrupt, ReplayExhausted):
+        print("\n🛑 Stopped.")
+    finally:
+        cam.camera.close()
+        cam.sequence.close()
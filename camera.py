@@ -0,0 +1,384 @@
+"""
+Camera Backends
+===============
+One capture interface for the Pi camera (Picamera2), a Canon over USB
+(gphoto2) and a replay source (a directory of images or a video file played
+back at a target FPS), so every capture/analysis loop can run, and be timed,
+on a machine with no camera attached.
+
+Every backend has:
+    start(), close()
+    capture_image()      -> PIL RGB image
+    capture_array()      -> uint8 numpy array (H, W, 3) in RGB order, like
+                            capture_image(); convert with cv2.COLOR_RGB2BGR
+                            before handing it to cv2.imencode / imwrite
+    capture_file(path)   -> path actually written (gphoto2's %C extension
+                            code is honoured; other backends write JPG)
+    latency              -> CaptureLatency of every capture call
+
+Latency is the time the caller was blocked in the capture call: sensor
+wait, shutter + USB download for gphoto2, pacing + decode for replay.
+
+Usage:
+    parser = argparse.ArgumentParser()
+    add_camera_arguments(parser)
+    args = parser.parse_args()
+    camera = camera_from_args(args, size=(1920, 1080))
+    image = camera.capture_image()
+    print(camera.latency.summary())
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from gphoto2_session import GPhoto2Session, GPhoto2Error
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"}
+VIDEO_SUFFIXES = {".mp4", ".avi", ".mov", ".mkv", ".h264", ".mjpeg"}
+BACKENDS = ("picamera", "gphoto2", "replay")
+
+
+class CameraError(Exception):
+    """A capture failed."""
+
+
+class CameraBusy(CameraError):
+    """The camera reported it is busy; retrying after a pause usually works."""
+
+
+class ReplayExhausted(Exception):
+    """Raised when a non-looping replay has no frames left."""
+
+
+class CaptureLatency:
+    """Running capture-latency stats (ms); p95 is over the most recent `window` captures."""
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total_ms = 0.0
+        self.last_ms = None
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        self.count += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        self.recent.append(ms)
+
+    def summary(self):
+        if not self.count:
+            return {"captures": 0}
+        return {
+            "captures": self.count,
+            "last_ms": round(self.last_ms, 1),
+            "mean_ms": round(self.total_ms / self.count, 1),
+            "p95_ms": round(float(np.percentile(self.recent, 95)), 1),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class Camera:
+    """Base class: subclasses implement _capture_image (and _capture_file where native)."""
+
+    name = "camera"
+
+    def __init__(self):
+        self.latency = CaptureLatency()
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _timed(self, fn, *args):
+        # Only successful captures are counted
+        t = time.perf_counter()
+        result = fn(*args)
+        self.latency.add(time.perf_counter() - t)
+        return result
+
+    def _capture_image(self):
+        raise NotImplementedError
+
+    def _capture_array(self):
+        return np.asarray(self._capture_image())
+
+    def _capture_file(self, path, wait_s=None):
+        path = path.replace("%C", "JPG")
+        self._capture_image().save(path)
+        return path
+
+    def capture_image(self):
+        return self._timed(self._capture_image)
+
+    def capture_array(self):
+        return self._timed(self._capture_array)
+
+    def capture_file(self, path, wait_s=None):
+        """wait_s: how long to wait for the camera to deliver the file (gphoto2 only)."""
+        return self._timed(self._capture_file, path, wait_s)
+
+
+# =============================================================================
+# Raspberry Pi camera
+# =============================================================================
+class PiCamera(Camera):
+    """Picamera2; `picam2` is exposed for encoder use (recording, hardware MJPEG)."""
+
+    name = "picamera"
+
+    def __init__(self, size=(1920, 1080), video=False, lores=None, warmup_s=2):
+        super().__init__()
+        from picamera2 import Picamera2
+        self.picam2 = Picamera2()
+        self.warmup_s = warmup_s
+        streams = {"main": {"size": tuple(size)}}
+        if lores:
+            streams["lores"] = {"size": tuple(lores)}
+        create = self.picam2.create_video_configuration if video else self.picam2.create_still_configuration
+        self.picam2.configure(create(**streams))
+
+    def start(self):
+        self.picam2.start()
+        if self.warmup_s:
+            time.sleep(self.warmup_s)  # let exposure / white balance settle
+
+    def close(self):
+        self.picam2.close()
+
+    def _capture_image(self):
+        return self.picam2.capture_image("main")
+
+    def _capture_array(self):
+        # The default formats (BGR888 still, XBGR8888 video) are laid out as
+        # [R, G, B] / [R, G, B, 255] per pixel; drop the padding byte
+        array = self.picam2.capture_array("main")
+        if array.ndim == 3 and array.shape[2] == 4:
+            array = np.ascontiguousarray(array[..., :3])
+        return array
+
+    def _capture_file(self, path, wait_s=None):
+        path = path.replace("%C", "JPG")
+        self.picam2.capture_file(path)
+        return path
+
+
+# =============================================================================
+# Canon (or any PTP camera) over gphoto2
+# =============================================================================
+def run_cmd(args):
+    return subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def is_busy(message):
+    return "PTP Device Busy" in message or "I/O in progress" in message
+
+
+class GPhoto2Camera(Camera):
+    """Trigger + download via the gphoto2 CLI, saving to the camera's SD card.
+
+    persistent=True keeps one gphoto2 shell (one PTP session) open and returns
+    as soon as each file has downloaded; persistent=False spawns a trigger
+    and a fixed-length wait-event-and-download process per shot.
+    """
+
+    name = "gphoto2"
+    SAVED_RE = re.compile(r"Saving file as (.+)")
+
+    def __init__(self, wait_s=8, gphoto2="gphoto2", persistent=True):
+        super().__init__()
+        self.wait_s = wait_s
+        self.gphoto2 = gphoto2
+        self.session = GPhoto2Session(gphoto2) if persistent else None
+
+    def start(self):
+        # Avoid the desktop auto-mounter grabbing the camera; harmless if not running
+        run_cmd(["killall", "gvfs-gphoto2-volume-monitor"])
+        run_cmd(["killall", "gvfsd-gphoto2"])
+        # Save to SD card (more reliable)
+        if self.session:
+            self.session.open()
+            self.session.command("set-config capturetarget=1")
+        else:
+            run_cmd([self.gphoto2, "--set-config", "capturetarget=1"])
+
+    def close(self):
+        if self.session:
+            self.session.close()
+
+    def _capture_file(self, path, wait_s=None):
+        """path may use gphoto2 filename codes such as %C (the camera's extension)."""
+        if self.session:
+            return self._session_capture_file(path, wait_s)
+        r1 = run_cmd([self.gphoto2, "--trigger-capture"])
+        if r1.returncode != 0:
+            self._fail(f"trigger failed: {r1.stderr.strip()}")
+        r2 = run_cmd([
+            self.gphoto2,
+            f"--wait-event-and-download={wait_s or self.wait_s}s",
+            f"--filename={path}",
+            "--force-overwrite",
+        ])
+        if r2.returncode != 0:
+            self._fail(r2.stderr.strip())
+        saved = self.SAVED_RE.search(r2.stdout)
+        return saved.group(1).strip() if saved else path
+
+    def _session_capture_file(self, path, wait_s=None):
+        try:
+            staged, _ = self.session.capture(wait_s or self.wait_s)
+        except GPhoto2Error as e:
+            self._fail(str(e))
+        path = path.replace("%C", os.path.splitext(staged)[1].lstrip("."))
+        shutil.move(staged, path)
+        return path
+
+    def _fail(self, message):
+        raise (CameraBusy if is_busy(message) else CameraError)(message)
+
+    def _capture_image(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._capture_file(os.path.join(tmp, "capture.%C"))
+            with Image.open(path) as img:
+                return img.convert("RGB")
+
+
+# =============================================================================
+# Replay (directory of images or a video file)
+# =============================================================================
+class ReplayCamera(Camera):
+    """Plays back a directory of images (sorted by name) or a video file.
+
+    fps paces captures to a target frame rate (None = as fast as possible);
+    size resizes every frame; loop=False raises ReplayExhausted at the end.
+    """
+
+    name = "replay"
+
+    def __init__(self, source, fps=None, loop=True, size=None):
+        super().__init__()
+        self.source = Path(source)
+        self.fps = fps
+        self.loop = loop
+        self.size = tuple(size) if size else None
+        self.index = 0
+        self._next_due = None
+        self._video = None
+        if self.source.is_dir():
+            self.paths = sorted(p for p in self.source.iterdir()
+                                if p.suffix.lower() in IMAGE_SUFFIXES)
+            if not self.paths:
+                raise FileNotFoundError(f"No images to replay in {self.source}")
+        elif self.source.suffix.lower() in VIDEO_SUFFIXES:
+            import cv2
+            self.paths = None
+            self._video = cv2.VideoCapture(str(self.source))
+            if not self._video.isOpened():
+                raise FileNotFoundError(f"Cannot open video {self.source}")
+        else:
+            raise FileNotFoundError(f"Nothing to replay at {self.source}")
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+
+    def _pace(self):
+        if not self.fps:
+            return
+        now = time.perf_counter()
+        if self._next_due is not None and now < self._next_due:
+            time.sleep(self._next_due - now)
+            now = self._next_due
+        self._next_due = now + 1.0 / self.fps
+
+    def _next_path(self):
+        if self.index >= len(self.paths):
+            if not self.loop:
+                raise ReplayExhausted(str(self.source))
+            self.index = 0
+        path = self.paths[self.index]
+        self.index += 1
+        return path
+
+    def _next_video_frame(self):
+        import cv2
+        ok, frame = self._video.read()
+        if not ok:
+            if not self.loop or self.index == 0:
+                raise ReplayExhausted(str(self.source))
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            ok, frame = self._video.read()
+            if not ok:
+                raise ReplayExhausted(str(self.source))
+        self.index += 1
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def _capture_image(self):
+        self._pace()
+        if self._video is not None:
+            img = self._next_video_frame()
+        else:
+            img = Image.open(self._next_path()).convert("RGB")
+        if self.size and img.size != self.size:
+            img = img.resize(self.size)
+        return img
+
+
+# =============================================================================
+# Construction
+# =============================================================================
+def open_camera(backend="picamera", size=(1920, 1080), replay=None, fps=None, loop=True,
+                video=False, warmup_s=2, wait_s=8, gphoto2="gphoto2", persistent=True):
+    """Create and start a camera. replay=SOURCE selects the replay backend.
+
+    video/warmup_s apply to the Pi camera, wait_s/gphoto2/persistent to the
+    gphoto2 backend; size applies to
+    the Pi camera and resizes replayed frames (None keeps them as they are).
+    """
+    if replay:
+        backend = "replay"
+    if backend == "picamera":
+        camera = PiCamera(size, video=video, warmup_s=warmup_s)
+    elif backend == "gphoto2":
+        camera = GPhoto2Camera(wait_s=wait_s, gphoto2=gphoto2, persistent=persistent)
+    elif backend == "replay":
+        if not replay:
+            raise ValueError("the replay backend needs a source (--replay DIR|VIDEO)")
+        camera = ReplayCamera(replay, fps=fps, loop=loop, size=size)
+    else:
+        raise ValueError(f"Unknown camera backend: {backend}")
+    camera.start()
+    return camera
+
+
+def add_camera_arguments(parser, default="picamera"):
+    parser.add_argument("--camera", choices=BACKENDS, default=default,
+                        help=f"capture backend (default {default})")
+    parser.add_argument("--replay", metavar="SRC",
+                        help="replay a directory of images or a video file (implies --camera replay)")
+    parser.add_argument("--fps", type=float, default=None, help="replay frame rate")
+    parser.add_argument("--once", action="store_true", help="stop after one pass over --replay SRC")
+    parser.add_argument("--gphoto2", default="gphoto2", metavar="PATH",
+                        help="gphoto2 executable (e.g. ./fake_gphoto2.py for testing)")
+    parser.add_argument("--gphoto2-per-shot", action="store_true",
+                        help="spawn gphoto2 per shot instead of keeping one session open")
+
+
+def camera_from_args(args, size=(1920, 1080), **options):
+    return open_camera(args.camera, size=size, replay=args.replay, fps=args.fps,
+                       loop=not args.once, gphoto2=args.gphoto2,
+                       persistent=not args.gphoto2_per_shot, **options)
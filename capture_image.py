@@ -1,19 +1,27 @@
-from picamera2 import Picamera2
+import argparse
+from camera import open_camera, add_camera_arguments, camera_from_args
 
 class SimplePiCam:
-    def __init__(self, filename="rPiCameraImage.png"):
+    def __init__(self, filename="rPiCameraImage.png", args=None):
         self.filename = filename
-        self.picam2 = Picamera2()
+        self.args = args  # parsed camera arguments; None means the Pi camera
 
     def capture_image(self):
-        config = self.picam2.create_still_configuration(main={"size": (1920, 1080)})
-        self.picam2.configure(config)
-        self.picam2.start()
-        self.picam2.capture_file(self.filename)
-        print(f"Image saved as {self.filename}")
+        if self.args is None:
+            camera = open_camera("picamera", size=(1920, 1080))
+        else:
+            camera = camera_from_args(self.args, size=(1920, 1080))
+        try:
+            path = camera.capture_file(self.filename)
+        finally:
+            camera.close()
+        print(f"Image saved as {path} ({camera.latency.last_ms:.0f} ms)")
 
 if __name__ == "__main__":
-    cam = SimplePiCam()
+    parser = argparse.ArgumentParser(description="Capture a single image.")
+    add_camera_arguments(parser)
+    args = parser.parse_args()
+    cam = SimplePiCam(args=args)
     cam.capture_image()
 
 
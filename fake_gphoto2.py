@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Fake gphoto2
+============
+Stand-in for the gphoto2 CLI so the Canon capture code can be run and timed
+with no camera attached. Implements the calls this repo makes:
+
+    fake_gphoto2.py --set-config capturetarget=1
+    fake_gphoto2.py --trigger-capture
+    fake_gphoto2.py --wait-event-and-download=8s --filename=out.%C --force-overwrite
+    fake_gphoto2.py --shell --filename=dir/%f.%C --force-overwrite
+        (stdin: set-config ..., trigger-capture, wait-event-and-download ..., exit)
+
+Each download copies FAKE_GPHOTO2_IMAGE (default BaseGreenField.png next to
+this file, re-encoded as JPEG) after FAKE_GPHOTO2_DELAY seconds (default
+0.3), and prints "Saving file as <path>" like gphoto2 does. Setting
+FAKE_GPHOTO2_STARTUP adds a per-process delay, to mimic the PTP session
+being opened by every process; FAKE_GPHOTO2_BUSY=0.2 makes 20% of triggers
+fail with "PTP Device Busy".
+
+Usage:
+    python3 CanonCapture.py --gphoto2 ./fake_gphoto2.py
+"""
+
+import io
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image
+
+SOURCE = os.environ.get("FAKE_GPHOTO2_IMAGE", str(Path(__file__).with_name("BaseGreenField.png")))
+DELAY_S = float(os.environ.get("FAKE_GPHOTO2_DELAY", "0.3"))
+STARTUP_S = float(os.environ.get("FAKE_GPHOTO2_STARTUP", "0"))
+BUSY_RATE = float(os.environ.get("FAKE_GPHOTO2_BUSY", "0"))
+COUNTER_FILE = Path(os.environ.get("FAKE_GPHOTO2_STATE", "/tmp/fake_gphoto2_counter"))
+BUSY_ERROR = "*** Error (-110: 'I/O in progress') ***\nPTP Device Busy"
+
+_jpeg = None
+
+
+def jpeg_bytes():
+    global _jpeg
+    if _jpeg is None:
+        buf = io.BytesIO()
+        Image.open(SOURCE).convert("RGB").save(buf, "JPEG", quality=90)
+        _jpeg = buf.getvalue()
+    return _jpeg
+
+
+def next_camera_name():
+    # Camera-side names (IMG_0001.JPG, ...) keep counting across processes, like the SD card
+    try:
+        n = int(COUNTER_FILE.read_text()) + 1
+    except (OSError, ValueError):
+        n = 1
+    COUNTER_FILE.write_text(str(n))
+    return f"IMG_{n:04d}"
+
+
+def download(pattern, force=True):
+    time.sleep(DELAY_S)
+    name = next_camera_name()
+    path = pattern.replace("%f", name).replace("%C", "JPG")
+    if os.path.exists(path) and not force:
+        print(f"File {path} exists. Overwrite? [y|n]", flush=True)
+        return 1
+    with open(path, "wb") as f:
+        f.write(jpeg_bytes())
+    print(f"Saving file as {path}", flush=True)
+    return 0
+
+
+def trigger():
+    if random.random() < BUSY_RATE:
+        print(BUSY_ERROR, file=sys.stderr, flush=True)
+        return 1
+    return 0
+
+
+def shell(pattern, force):
+    pending = 0
+    for line in sys.stdin:
+        command = line.strip().split(" ", 1)[0]
+        if command in ("exit", "quit", "q"):
+            return 0
+        if command == "trigger-capture":
+            if trigger() == 0:
+                pending += 1
+        elif command == "wait-event-and-download":
+            # A failed trigger never produces FILEADDED; real gphoto2 would wait on
+            if pending:
+                pending -= 1
+                download(pattern, force)
+        elif command in ("set-config", "lcd", "cd"):
+            pass
+        elif command:
+            print(f"*** Error: unknown command '{command}' ***", flush=True)
+    return 0
+
+
+def main(argv):
+    time.sleep(STARTUP_S)
+    opts = {}
+    for arg in argv:
+        key, _, value = arg.partition("=")
+        opts[key] = value
+    pattern = opts.get("--filename", "%f.%C")
+    force = "--force-overwrite" in opts
+
+    if "--shell" in opts:
+        return shell(pattern, force)
+    if "--trigger-capture" in opts:
+        return trigger()
+    if "--wait-event-and-download" in opts:
+        return download(pattern, force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+"""
+In-memory Frame Buffer
+======================
+Holds the latest version of a set of named images (e.g. "placed" and
+"filtered") for a web UI to fetch, instead of rewriting files in static/.
+
+Each publish() bumps one version number for the whole set, so a page can
+tell whether anything changed and request /frames/<name>?v=<version>. Each
+image is encoded at most once per version, and only when someone asks for it.
+An image can also be published as a zero-argument callable that builds it, so
+a view nobody opens (e.g. a mask rendered as a picture) is never built.
+"""
+
+import io
+import threading
+
+MIMETYPES = {"JPEG": "image/jpeg", "PNG": "image/png"}
+
+
+class FrameBuffer:
+    def __init__(self, default_format="JPEG", formats=None, jpeg_quality=90):
+        self.default_format = default_format
+        self.formats = formats or {}
+        self.jpeg_quality = jpeg_quality
+        self.cond = threading.Condition()
+        self.version = 0
+        self.info = None
+        self._images = {}
+        self._encoded = {}
+
+    def publish(self, images, info=None):
+        """Replace the named PIL images or image factories (and optional info dict) as one new version."""
+        with self.cond:
+            self.version += 1
+            self._images = dict(images)
+            self._encoded = {}
+            self.info = info
+            self.cond.notify_all()
+            return self.version
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the version is newer than `version` (or timeout); return the current version."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+    def get(self, name):
+        """(version, encoded bytes, mimetype) for a named image, or None if unknown."""
+        with self.cond:
+            version = self.version
+            image = self._images.get(name)
+            encoded = self._encoded.get(name)
+        if image is None:
+            return None
+
+        fmt = self.formats.get(name, self.default_format)
+        if encoded is None:
+            if callable(image):
+                image = image()
+            buf = io.BytesIO()
+            if fmt == "JPEG":
+                image.convert("RGB").save(buf, "JPEG", quality=self.jpeg_quality)
+            else:
+                image.save(buf, fmt, compress_level=1)
+            encoded = buf.getvalue()
+            with self.cond:
+                if self.version == version:
+                    self._encoded[name] = encoded
+        return version, encoded, MIMETYPES.get(fmt, "application/octet-stream")
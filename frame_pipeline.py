@@ -0,0 +1,171 @@
+"""
+Threaded Frame Pipeline
+=======================
+Runs a capture source and a chain of processing stages on separate threads,
+connected by bounded queues, so the sustained frame rate is set by the
+slowest stage instead of the sum of all of them.
+
+Backpressure on the queue after the source is configurable:
+    "block" - the source waits until the next stage has room (no frame lost)
+    "drop"  - the oldest queued frame is discarded to make room (lowest latency)
+Queues further down the chain always block, so results are never dropped.
+Dropped frames are counted against the stage that never saw them, and
+on_drop(item) lets the caller log which ones they were (e.g. to explain gaps
+in frame numbers allocated at capture time).
+"""
+
+import queue
+import threading
+import time
+
+BLOCK = "block"
+DROP_OLDEST = "drop"
+BACKPRESSURE_POLICIES = (BLOCK, DROP_OLDEST)
+
+_STOP = object()
+
+
+class FrameQueue:
+    """Bounded queue with block or drop-oldest behaviour when full."""
+
+    def __init__(self, maxsize=2, policy=BLOCK, on_drop=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.policy = policy
+        self.on_drop = on_drop
+        self.dropped = 0
+
+    def put(self, item):
+        if self.policy == BLOCK:
+            self.queue.put(item)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(dropped)
+
+    def get(self):
+        return self.queue.get()
+
+    def close(self):
+        # The stop marker must never be dropped, so always wait for room
+        self.queue.put(_STOP)
+
+
+class StageStats:
+    """Item count, busy time and dropped inputs for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy_s = 0.0
+        self.dropped = 0
+
+    def record(self, duration):
+        self.count += 1
+        self.busy_s += duration
+
+    def as_dict(self):
+        mean_ms = (self.busy_s / self.count * 1000) if self.count else 0.0
+        return {"stage": self.name, "count": self.count, "mean_ms": round(mean_ms, 2),
+                "dropped": self.dropped}
+
+
+class Pipeline:
+    """
+    source() is called repeatedly on its own thread and returns the next item,
+    or None when there is nothing more to produce. Each stage is a
+    (name, fn) pair; fn(item) returns the item for the next stage, or None to
+    drop it from the chain. on_drop(item) is called, on the source thread,
+    for every item discarded by the "drop" policy.
+    """
+
+    def __init__(self, source, stages, maxsize=2, policy=BLOCK, source_name="capture", on_drop=None):
+        self.source = source
+        self.stages = stages
+        self.stop_event = threading.Event()
+        self.stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages]
+        self.queues = [FrameQueue(maxsize, policy if i == 0 else BLOCK,
+                                  on_drop=self._dropper(self.stats[i + 1], on_drop))
+                       for i in range(len(stages))]
+        self.threads = []
+        self.started_at = None
+
+    @staticmethod
+    def _dropper(stats, on_drop):
+        def dropped(item):
+            stats.dropped += 1
+            if on_drop is not None:
+                on_drop(item)
+        return dropped
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self.threads = [threading.Thread(target=self._run_source, daemon=True)]
+        for i, (_, fn) in enumerate(self.stages):
+            out_q = self.queues[i + 1] if i + 1 < len(self.queues) else None
+            self.threads.append(threading.Thread(
+                target=self._run_stage, args=(fn, self.queues[i], out_q, self.stats[i + 1]),
+                daemon=True))
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        """Ask the source to finish; queued items still drain through the stages."""
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        for t in self.threads:
+            t.join(timeout)
+
+    def is_alive(self):
+        return any(t.is_alive() for t in self.threads)
+
+    def _run_source(self):
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                item = self.source()
+                if item is None:
+                    break
+                self.stats[0].record(time.perf_counter() - t0)
+                self.queues[0].put(item)
+        finally:
+            self.queues[0].close()
+
+    def _run_stage(self, fn, in_q, out_q, stats):
+        while True:
+            item = in_q.get()
+            if item is _STOP:
+                break
+            t0 = time.perf_counter()
+            try:
+                result = fn(item)
+            except Exception as e:
+                print(f"[pipeline] {stats.name} failed: {e}")
+                result = None
+            stats.record(time.perf_counter() - t0)
+            if out_q is not None and result is not None:
+                out_q.put(result)
+        if out_q is not None:
+            out_q.close()
+
+    def summary(self):
+        """Per-stage counts and mean times, dropped frames, and overall fps."""
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        done = self.stats[-1].count
+        return {
+            "stages": [s.as_dict() for s in self.stats],
+            "dropped": self.queues[0].dropped if self.queues else 0,
+            "elapsed_s": round(elapsed, 2),
+            "fps": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+        }
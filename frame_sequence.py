@@ -0,0 +1,104 @@
+"""
+Frame Sequence Numbers
+======================
+Allocates output frame numbers (output000123.png, ...) from a small state
+file in the output folder instead of listing and regex-matching the whole
+folder, so naming a frame costs the same at frame 10 and frame 100000.
+
+The state file holds the next unreserved number. Numbers are reserved in
+blocks: one locked, fsync'ed write (temp file + os.replace, so a crash leaves
+either the old or the new value, never a torn one) covers `block` frames.
+A crash can leave a gap in the numbering but never reuses a number. Several
+processes can share a folder; fcntl.flock serializes their reservations.
+
+The first time a folder is used (no state file yet) it is scanned once for
+existing <prefix><digits>.<ext> files, including the old 4-digit names, so
+numbering carries on after them. Names are 6 digits wide by default.
+
+Usage:
+    sequence = FrameSequence("OutputImages")
+    path = sequence.next_path("png")   # OutputImages/output000001.png
+"""
+
+import fcntl
+import os
+import re
+import threading
+
+STATE_NAME = ".{prefix}.seq"
+LOCK_NAME = ".{prefix}.seq.lock"
+
+
+class FrameSequence:
+    def __init__(self, folder, prefix="output", width=6, block=64):
+        self.folder = folder
+        self.prefix = prefix
+        self.width = width
+        self.block = block
+        os.makedirs(folder, exist_ok=True)
+        self.state_path = os.path.join(folder, STATE_NAME.format(prefix=prefix))
+        self.lock_path = os.path.join(folder, LOCK_NAME.format(prefix=prefix))
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # numbers in [_next, _end) are reserved by this process
+
+    def _scan(self):
+        """Highest existing frame number + 1 (one-time migration from folder scans)."""
+        rx = re.compile(rf"{re.escape(self.prefix)}(\d+)\.[A-Za-z0-9]+$")
+        highest = -1
+        for name in os.listdir(self.folder):
+            m = rx.match(name)
+            if m:
+                highest = max(highest, int(m.group(1)))
+        return highest + 1
+
+    def _read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return self._scan()
+
+    def _write_state(self, value):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{value}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.state_path)
+
+    def _reserve(self):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            start = self._read_state()
+            self._write_state(start + self.block)
+        self._next, self._end = start, start + self.block
+
+    def next(self):
+        """Allocate the next frame number."""
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve()
+            n = self._next
+            self._next += 1
+            return n
+
+    def name(self, n, ext):
+        return f"{self.prefix}{n:0{self.width}d}.{ext}"
+
+    def next_name(self, ext):
+        return self.name(self.next(), ext)
+
+    def next_path(self, ext):
+        return os.path.join(self.folder, self.next_name(ext))
+
+    def close(self):
+        """Hand back the unused part of our block if nobody reserved after it."""
+        with self._lock:
+            if self._next >= self._end:
+                return
+            with open(self.lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                if self._read_state() == self._end:
+                    self._write_state(self._next)
+            self._end = self._next
@@ -0,0 +1,118 @@
+"""
+Shared GCP Detection Helpers
+============================
+Image preparation and YOLO inference used by the capture/analysis scripts.
+
+Frames are handed to the model as numpy arrays, so there is no temporary
+JPEG written to disk, re-encoded, and decoded again before inference.
+GCPDetectionEngine loads the model once and warms it up, so the capture
+loops only pay for inference on each frame.
+
+Requirements: ultralytics, numpy, Pillow
+"""
+
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from PIL import Image
+from ultralytics import YOLO
+
+MODEL_PATH = "best.pt"
+CONF_LEVELS = [0.25, 0.1, 0.05, 0.01]
+
+Detection = namedtuple("Detection", ["detected", "conf", "count"])
+
+
+def prepare_image(arr, channel=2):
+    """Extract specified channel (0=Red, 1=Green, 2=Blue) as a 3-channel uint8 array."""
+    if arr.ndim == 3 and arr.shape[2] > channel:
+        channel_data = arr[:, :, channel]
+    elif arr.ndim == 2:
+        channel_data = arr
+    else:
+        channel_data = arr[:, :, -1] if arr.ndim == 3 else arr
+
+    if channel_data.dtype != np.uint8:
+        channel_data = ((channel_data - channel_data.min()) /
+                        (channel_data.max() - channel_data.min()) * 255).astype(np.uint8)
+
+    # All three planes are identical, so the RGB/BGR order YOLO assumes for
+    # numpy input does not matter.
+    return np.stack([channel_data] * 3, axis=2)
+
+
+def load_image(image_path, channel=2):
+    """Load image and extract specified channel (0=Red, 1=Green, 2=Blue)."""
+    return prepare_image(np.array(Image.open(image_path)), channel)
+
+
+def detection_tier(confidences, conf_levels=CONF_LEVELS):
+    """Return (tier, count) for the highest confidence tier any box reaches."""
+    for conf in sorted(conf_levels, reverse=True):
+        count = sum(1 for c in confidences if c >= conf)
+        if count > 0:
+            return conf, count
+    return None, 0
+
+
+def run_detection(model, image, single_pass=True, conf_levels=CONF_LEVELS):
+    """Run YOLO on a prepared array. Returns (tier, count), or (None, 0) if nothing found."""
+    if single_pass:
+        # One forward pass at the lowest threshold; the higher tiers are
+        # read off the same boxes instead of re-running the model.
+        results = model(image, conf=min(conf_levels), verbose=False)
+        detections = results[0].boxes
+        confidences = [] if detections is None else detections.conf.tolist()
+        return detection_tier(confidences, conf_levels)
+
+    for conf in sorted(conf_levels, reverse=True):
+        results = model(image, conf=conf, verbose=False)
+        detections = results[0].boxes
+        if detections is not None and len(detections) > 0:
+            return conf, len(detections)
+    return None, 0
+
+
+def log_detection(image_name, detected):
+    """Print the Yes/No detection line for the console.
+
+    The log file gets a separate "inference" record from the caller, written
+    through the buffered structured_log.StructuredLog writer.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    result = "Yes" if detected else "No"
+    line = f"[{timestamp}] Image: {image_name} | GCP detected: {result}"
+    print(line)
+    return line
+
+
+class GCPDetectionEngine:
+    """Loads the YOLO model once and keeps it warm across detections."""
+
+    def __init__(self, model_path=MODEL_PATH, channel=2, single_pass=True,
+                 conf_levels=CONF_LEVELS, warmup_size=(1080, 1920)):
+        self.model_path = model_path
+        self.channel = channel
+        self.single_pass = single_pass
+        self.conf_levels = conf_levels
+        self.model = YOLO(model_path)
+        if warmup_size:
+            self.warmup(warmup_size)
+
+    def warmup(self, size=(1080, 1920)):
+        """Run one dummy frame so the first real frame doesn't pay setup cost."""
+        dummy = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+        self.model(dummy, conf=min(self.conf_levels), verbose=False)
+
+    def detect(self, arr):
+        """Detect GCPs in a raw image array (any channel layout load_image accepts)."""
+        return self.detect_prepared(prepare_image(arr, self.channel))
+
+    def detect_prepared(self, image):
+        """Detect GCPs in an array that has already been through prepare_image."""
+        conf, count = run_detection(self.model, image, self.single_pass, self.conf_levels)
+        return Detection(count > 0, conf, count)
+
+    def detect_path(self, image_path):
+        """Decode image_path and detect GCPs in it."""
+        return self.detect(np.array(Image.open(image_path)))
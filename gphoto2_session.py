@@ -0,0 +1,177 @@
+"""
+Persistent gphoto2 Session
+==========================
+Keeps one `gphoto2 --shell` process (and so one USB/PTP session) open for a
+whole capture run, instead of spawning `--trigger-capture` and
+`--wait-event-and-download` processes for every shot. Re-opening the session
+per process is most of the per-shot overhead and a common source of
+"PTP Device Busy" errors.
+
+Commands are written to the shell's stdin; a reader thread parses its output
+into events:
+    ("file", path, t)    a download finished ("Saving file as ...")
+    ("error", text, t)   gphoto2 reported an error
+    ("exit", code, t)    the process ended
+
+Downloads land in a private staging directory and are moved to their final
+name by the caller, since the shell's --filename pattern is fixed at start.
+After an error or a timeout the shell may still be blocked in a wait, so the
+process is restarted.
+
+Usage:
+    with GPhoto2Session() as session:
+        session.command("set-config capturetarget=1")
+        path, seconds = session.capture(wait_s=8)     # trigger + download
+        for path, t in session.stream():              # files as they arrive
+            ...
+"""
+
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+SAVED_RE = re.compile(r"Saving file as (.+)")
+ERROR_RE = re.compile(r"\*\*\* Error|PTP Device Busy|I/O in progress|ERROR:")
+ERROR_SETTLE_S = 0.1  # gphoto2 prints multi-line errors; collect the rest of them
+
+
+class GPhoto2Error(Exception):
+    """gphoto2 reported an error, timed out or exited."""
+
+
+class GPhoto2Session:
+    def __init__(self, gphoto2="gphoto2"):
+        self.gphoto2 = gphoto2
+        self.proc = None
+        self.staging = None
+        self.events = queue.Queue()
+        self.restarts = 0
+        self._reader = None
+
+    # --- process lifecycle ----------------------------------------------------
+    def open(self):
+        if self.staging is None:
+            self.staging = tempfile.mkdtemp(prefix="gphoto2_")
+        self.events = queue.Queue()
+        self.proc = subprocess.Popen(
+            [self.gphoto2, "--shell", "--force-overwrite",
+             f"--filename={os.path.join(self.staging, '%f.%C')}"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, bufsize=1)
+        self._reader = threading.Thread(target=self._read, args=(self.proc, self.events), daemon=True)
+        self._reader.start()
+        return self
+
+    def _read(self, proc, events):
+        for line in proc.stdout:
+            # The shell prompt has no newline, so it can prefix any line
+            saved = SAVED_RE.search(line)
+            if saved:
+                events.put(("file", saved.group(1).strip(), time.perf_counter()))
+            elif ERROR_RE.search(line):
+                events.put(("error", line.strip(), time.perf_counter()))
+        events.put(("exit", proc.wait(), time.perf_counter()))
+
+    def _stop_process(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.write("exit\n")
+            self.proc.stdin.flush()
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+    def restart(self):
+        self._stop_process()
+        self.restarts += 1
+        self.open()
+
+    def close(self):
+        self._stop_process()
+        if self.staging:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- commands ---------------------------------------------------------------
+    def command(self, line):
+        if self.proc is None or self.proc.poll() is not None:
+            raise GPhoto2Error("gphoto2 shell is not running")
+        self.proc.stdin.write(line + "\n")
+        self.proc.stdin.flush()
+
+    def _error_text(self, first):
+        lines = [first]
+        deadline = time.perf_counter() + ERROR_SETTLE_S
+        while True:
+            try:
+                kind, value, _ = self.events.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                return " ".join(lines)
+            if kind == "error":
+                lines.append(value)
+
+    def _drain(self):
+        """Drop events left over from earlier commands (e.g. a late download)."""
+        while True:
+            try:
+                self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def next_file(self, timeout=None):
+        """Wait for the next download; return its staged path or raise GPhoto2Error."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            try:
+                kind, value, _ = self.events.get(timeout=remaining)
+            except queue.Empty:
+                self.restart()  # the shell is still blocked in its wait
+                raise GPhoto2Error(f"no file from the camera within {timeout:g}s")
+            if kind == "file":
+                return value
+            if kind == "error":
+                message = self._error_text(value)
+                self.restart()
+                raise GPhoto2Error(message)
+            if kind == "exit":
+                self.open()
+                raise GPhoto2Error(f"gphoto2 exited with status {value}")
+
+    def capture(self, wait_s=8):
+        """Trigger the shutter and wait for the new file. Returns (staged path, seconds)."""
+        self._drain()
+        start = time.perf_counter()
+        self.command("trigger-capture")
+        # Returns as soon as the new file is downloaded, not after a fixed time
+        self.command("wait-event-and-download FILEADDED")
+        path = self.next_file(wait_s)
+        return path, time.perf_counter() - start
+
+    def stream(self, wait_s=None):
+        """Yield (staged path, arrival time) for every file the camera produces,
+        e.g. from its own shutter button or intervalometer."""
+        while True:
+            self.command("wait-event-and-download FILEADDED")
+            try:
+                path = self.next_file(wait_s)
+            except GPhoto2Error:
+                if wait_s is not None:
+                    return
+                raise
+            yield path, time.perf_counter()
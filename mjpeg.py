@@ -0,0 +1,323 @@
+"""
+Shared MJPEG Broadcaster
+========================
+One producer thread captures each frame once into a shared latest-frame
+buffer; every /video_feed client waits on a condition variable and yields
+JPEG bytes of that frame. Camera cost stays flat as the number of viewers
+grows, and a slow client simply skips to the newest frame (counted as
+dropped) instead of building a backlog.
+
+Each client adapts to its own link. The time the server spends writing a
+frame to the socket (from yield until the generator is resumed) is tracked
+per client; when it exceeds the target latency the client steps down a
+quality tier (lower JPEG quality, then smaller scale) and its frame interval
+grows so the link is never kept busy more than ~80% of the time. When sends
+are comfortably fast again it steps back up. Each tier is encoded at most
+once per frame, however many clients are on it.
+
+The producer only runs while at least one client is connected. A failed
+capture is logged and retried with a growing back-off, so a camera hiccup
+stalls the stream instead of ending it; exceptions listed in end_of_stream
+(e.g. camera.ReplayExhausted) stop the producer and end every stream. With
+produce=False there is no producer at all: frames are pushed with publish(),
+e.g. by a hardware MJPEG encoder writing into an EncoderOutput. Pre-encoded
+frames can't be re-encoded per tier, so clients then adapt by frame interval
+(dropping frames) only.
+
+capture() must return RGB arrays (camera.Camera.capture_array does); they
+are converted to BGR for cv2 only when encoded.
+
+Usage (open_camera_stream and register_stream_routes are the wiring the
+stream apps share):
+    camera, broadcaster = open_camera_stream(args, size=(640, 480))
+    register_stream_routes(app, broadcaster)   # /video_feed, /stream_stats
+"""
+
+import io
+import itertools
+import threading
+import time
+
+import cv2
+from flask import Response, jsonify
+
+from camera import ReplayExhausted, camera_from_args
+
+MJPEG_MIMETYPE = "multipart/x-mixed-replace; boundary=frame"
+
+# (JPEG quality, downscale factor), best first; 95 is cv2's default quality
+DEFAULT_TIERS = ((95, 1.0), (80, 1.0), (65, 0.75), (50, 0.5), (40, 0.5), (30, 0.25))
+TARGET_LATENCY_S = 0.25
+MAX_INTERVAL_S = 2.0
+LINK_UTILIZATION = 0.8
+SMOOTHING = 0.3
+STEP_UP_AFTER = 10  # consecutive fast sends before trying a better tier
+MAX_BACKOFF_S = 5.0  # longest wait between capture retries after errors
+
+
+def multipart_frame(jpeg):
+    return (b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n")
+
+
+class EncoderOutput(io.BufferedIOBase):
+    """File-like sink for picamera2's FileOutput: each write() is one whole JPEG."""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    def writable(self):
+        return True
+
+    def write(self, buf):
+        self.broadcaster.publish(jpeg=bytes(buf))
+        return len(buf)
+
+
+class StreamClient:
+    """Per-client link estimate and the tier / interval chosen from it."""
+
+    def __init__(self, client_id, tiers, interval, target_latency, adaptive=True):
+        self.id = client_id
+        self.tiers = tiers
+        self.base_interval = interval
+        self.interval = interval
+        self.target_latency = target_latency
+        self.adaptive = adaptive
+        self.tier = 0
+        self.send_s = None
+        self.bytes_per_s = None
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.started = time.monotonic()
+        self._fast_streak = 0
+
+    def record(self, nbytes, send_s):
+        self.frames_sent += 1
+        self.bytes_sent += nbytes
+        if self.send_s is None:
+            self.send_s = send_s
+        else:
+            self.send_s += SMOOTHING * (send_s - self.send_s)
+        if send_s > 0:
+            rate = nbytes / send_s
+            self.bytes_per_s = rate if self.bytes_per_s is None else self.bytes_per_s + SMOOTHING * (rate - self.bytes_per_s)
+        if not self.adaptive:
+            return
+
+        if self.send_s > self.target_latency:
+            self.tier = min(self.tier + 1, len(self.tiers) - 1)
+            self._fast_streak = 0
+        elif self.send_s < self.target_latency / 3:
+            self._fast_streak += 1
+            if self._fast_streak >= STEP_UP_AFTER and self.tier > 0:
+                self.tier -= 1
+                self._fast_streak = 0
+                self.send_s = None  # re-measure at the new size
+        else:
+            self._fast_streak = 0
+
+        # Leave the link idle part of the time so frames don't queue in socket buffers
+        busy = (self.send_s or 0) / LINK_UTILIZATION
+        self.interval = min(max(self.base_interval, busy), MAX_INTERVAL_S)
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        quality, scale = self.tiers[self.tier]
+        return {
+            "id": self.id,
+            "tier": self.tier,
+            "quality": quality,
+            "scale": scale,
+            "interval_s": round(self.interval, 3),
+            "send_ms": round(self.send_s * 1000, 1) if self.send_s is not None else None,
+            "kbps": round(self.bytes_per_s * 8 / 1000, 1) if self.bytes_per_s else None,
+            "fps": round(self.frames_sent / elapsed, 2),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+class MJPEGBroadcaster:
+    def __init__(self, capture, interval=0.1, quality=None, tiers=DEFAULT_TIERS,
+                 target_latency=TARGET_LATENCY_S, adaptive=True, produce=True, end_of_stream=()):
+        self.capture = capture
+        self.produce = produce
+        self.end_of_stream = tuple(end_of_stream)
+        self.interval = interval
+        self.tiers = list(tiers)
+        if quality:
+            self.tiers[0] = (quality, self.tiers[0][1])
+        self.target_latency = target_latency
+        self.adaptive = adaptive
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.frame = None  # last captured array, for /capture and lower tiers
+        self.clients = {}
+        self.running = True
+        self.encodes = [0] * len(self.tiers)
+        self._encoded = {}
+        self._tier_locks = [threading.Lock() for _ in self.tiers]
+        self._ids = itertools.count(1)
+        self._thread = None
+        self.capture_errors = 0
+
+    def _ensure_producer(self):
+        # Called with self.cond held
+        if not self.produce:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._produce, daemon=True)
+            self._thread.start()
+
+    def _produce(self):
+        failures = 0
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.clients or not self.running)
+                if not self.running:
+                    return
+                # No point capturing faster than the fastest client consumes
+                interval = min(c.interval for c in self.clients.values())
+            start = time.monotonic()
+            try:
+                frame = self.capture()
+            except self.end_of_stream:
+                print("[i] Stream source ended")
+                self.stop()
+                return
+            except Exception as e:
+                # Keep producing: clients are waiting on this thread for their next frame
+                self.capture_errors += 1
+                failures += 1
+                backoff = min(max(interval, 0.1) * 2 ** failures, MAX_BACKOFF_S)
+                print(f"[!] Stream capture failed ({e!r}); retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+                continue
+            failures = 0
+            self.publish(frame)
+            time.sleep(max(interval - (time.monotonic() - start), 0))
+
+    def publish(self, frame=None, jpeg=None):
+        """Make a frame the latest one and wake every client.
+
+        jpeg, if given, is used as the tier-0 encoding; with frame=None it is
+        the only encoding and every client gets it unchanged.
+        """
+        with self.cond:
+            self.seq += 1
+            self.frame = frame
+            self._encoded = {0: jpeg} if jpeg is not None else {}
+            self.cond.notify_all()
+            return self.seq
+
+    def wait_for_frame(self, seq, timeout=None):
+        """Seq of the first frame newer than seq, or seq unchanged on timeout."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > seq or not self.running, timeout)
+            return self.seq
+
+    def jpeg(self, tier=0):
+        """(seq, jpeg) of the latest frame at a tier, encoding it once if needed."""
+        with self.cond:
+            seq, frame = self.seq, self.frame
+            cached = self._encoded.get(tier)
+        if cached is not None:
+            return seq, cached
+        if frame is None:
+            # Pre-encoded only (hardware path): every tier gets the same bytes
+            return seq, self._encoded.get(0)
+
+        with self._tier_locks[tier]:
+            with self.cond:
+                if self.seq == seq and tier in self._encoded:
+                    return seq, self._encoded[tier]
+            quality, scale = self.tiers[tier]
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                return seq, None
+            encoded = buffer.tobytes()
+            with self.cond:
+                self.encodes[tier] += 1
+                if self.seq == seq:
+                    self._encoded[tier] = encoded
+        return seq, encoded
+
+    def latest_frame(self):
+        """Most recent captured array, or a fresh capture if nothing is streaming."""
+        with self.cond:
+            if self.frame is not None and (self.clients or not self.running):
+                return self.frame
+        return self.capture()
+
+    def stream(self):
+        """Generator of multipart JPEG parts for one client."""
+        with self.cond:
+            client = StreamClient(next(self._ids), self.tiers, self.interval,
+                                  self.target_latency, self.adaptive)
+            self.clients[client.id] = client
+            self._ensure_producer()
+            self.cond.notify_all()
+            seq = self.seq
+        try:
+            next_due = time.monotonic()
+            while self.running:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                latest = self.wait_for_frame(seq, timeout=5)
+                if latest == seq:
+                    continue
+                latest, jpeg = self.jpeg(client.tier)
+                if jpeg is None:
+                    continue
+                if seq:
+                    client.frames_dropped += max(latest - seq - 1, 0)
+                seq = latest
+
+                # The server writes the part before resuming us, so this
+                # measures how long the client's link took to accept it
+                sent = time.monotonic()
+                yield multipart_frame(jpeg)
+                client.record(len(jpeg), time.monotonic() - sent)
+                next_due = sent + client.interval
+        finally:
+            with self.cond:
+                self.clients.pop(client.id, None)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "seq": self.seq,
+                "target_latency_ms": round(self.target_latency * 1000),
+                "encodes_per_tier": list(self.encodes),
+                "capture_errors": self.capture_errors,
+                "clients": [c.summary() for c in self.clients.values()],
+            }
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+
+def open_camera_stream(args, size=(640, 480), interval=0.1):
+    """Open the camera chosen by the command-line args (see camera.add_camera_arguments)
+    with one broadcaster capturing from it; a --once replay ends the streams."""
+    camera = camera_from_args(args, size=size, video=True, warmup_s=0)
+    broadcaster = MJPEGBroadcaster(camera.capture_array, interval=interval,
+                                   end_of_stream=(ReplayExhausted,))
+    return camera, broadcaster
+
+
+def register_stream_routes(app, broadcaster):
+    """Add /video_feed (the shared MJPEG stream) and /stream_stats (per-client
+    quality tier, frame interval, send time and dropped frames) to a Flask app."""
+    app.add_url_rule("/video_feed", "video_feed",
+                     lambda: Response(broadcaster.stream(), mimetype=MJPEG_MIMETYPE))
+    app.add_url_rule("/stream_stats", "stream_stats", lambda: jsonify(broadcaster.stats()))
@@ -10,11 +10,7 @@ Instructions:
 Requirements: ultralytics, opencv-python, numpy, Pillow
 """
 
-import tempfile
 from pathlib import Path
-import numpy as np
-from PIL import Image
-from ultralytics import YOLO
 import time
 
 # =============================================================================
@@ -27,54 +23,15 @@ MODEL_PATH = "best.pt"  # Path to the YOLO model file
 # =============================================================================
 
 
-def load_image(image_path, channel=2):
-    """Load image and extract specified channel (0=Red, 1=Green, 2=Blue)."""
-    arr = np.array(Image.open(image_path))
+def test_gcp_detection(image_path, engine):
+    """Test GCP detection on image with an already-loaded engine."""
+    result = engine.detect_path(image_path)
+    if result.detected:
+        print(f"✅ GCP DETECTED: Found {result.count} GCP(s) with confidence ≥ {result.conf}")
+        return True
 
-    if arr.ndim == 3 and arr.shape[2] > channel:
-        channel_data = arr[:, :, channel]
-    elif arr.ndim == 2:
-        channel_data = arr
-    else:
-        channel_data = arr[:, :, -1] if arr.ndim == 3 else arr
-
-    # Convert to uint8 and make 3-channel
-    if channel_data.dtype != np.uint8:
-        channel_data = ((channel_data - channel_data.min()) /
-                        (channel_data.max() - channel_data.min()) * 255).astype(np.uint8)
-
-    return np.stack([channel_data] * 3, axis=2)
-
-
-def test_gcp_detection(image_path, model_path, channel=2):
-    """Test GCP detection on image."""
-    # Load model and image
-    model = YOLO(model_path)
-    image = load_image(image_path, channel)
-
-    # Save temporary file for YOLO
-    temp_path = tempfile.mktemp(suffix='.jpg')
-    Image.fromarray(image).save(temp_path, 'JPEG', quality=95)
-
-    try:
-        # Test multiple confidence levels
-        for conf in [0.25, 0.1, 0.05, 0.01]:
-            results = model(temp_path, conf=conf, verbose=False)
-            detections = results[0].boxes
-
-            if detections is not None and len(detections) > 0:
-                print(f"✅ GCP DETECTED: Found {len(detections)} GCP(s) with confidence ≥ {conf}")
-                return True
-
-        print("❌ NO GCP DETECTED")
-        return False
-
-    finally:
-        # Clean up temp file
-        try:
-            Path(temp_path).unlink()
-        except:
-            pass
+    print("❌ NO GCP DETECTED")
+    return False
 
 LOG_FILE = "test.txt"
 
@@ -124,5 +81,6 @@ while True:
 #     print(f"Testing GCP detection on: {IMAGE_PATH}")
 
 #     # Run test
-#     test_gcp_detection(IMAGE_PATH, MODEL_PATH)
+#     from gcp_detection import GCPDetectionEngine
+#     test_gcp_detection(IMAGE_PATH, GCPDetectionEngine(MODEL_PATH))
 #     time.sleep(5)
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Server-Sent Events helpers
+==========================
+Small helpers for pushing updates to the dashboards over one long-lived
+HTTP response (text/event-stream) instead of polling or meta-refresh.
+
+Flask's server is threaded by default, so each open stream holds one thread
+that sleeps on a condition variable until there is something to send.
+"""
+
+import json
+from flask import Response, stream_with_context
+
+KEEPALIVE_S = 15
+
+
+def sse_message(data, event=None, event_id=None):
+    """Format one SSE message; data is JSON-encoded."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_keepalive():
+    # Comment line: ignored by EventSource, keeps proxies and idle timeouts away
+    return ": keepalive\n\n"
+
+
+def last_event_id(request, default=0):
+    """Resume point sent by a reconnecting EventSource, else ?since=, else default."""
+    value = request.headers.get("Last-Event-ID") or request.args.get("since")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def sse_response(generator):
+    response = Response(stream_with_context(generator), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
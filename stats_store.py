@@ -0,0 +1,88 @@
+"""
+Append-only Stats Store
+=======================
+Per-frame image stats written as JSON Lines (one record per line), plus an
+in-memory ring of the most recent records for the dashboard routes.
+
+Appending a record is a single line write, so the per-frame cost stays
+constant no matter how long the capture session runs, and reading recent
+stats never touches the file.
+
+Every record gets a sequence number ("seq", starting at 1) that clients use
+as a cursor: since(seq) returns only the records added after it, and
+wait_for_new(seq) lets a push endpoint sleep until there is one. Records
+that have already left the ring are read back from the file by seeking to
+their stored byte offset, so old pages cost the same as new ones.
+"""
+
+import json
+import threading
+from collections import deque
+
+
+class StatsStore:
+    def __init__(self, path, ring_size=500):
+        self.path = path
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.recent = deque(maxlen=ring_size)
+        self.count = 0
+        self.offsets = []  # byte offset of each record's line, indexed by seq - 1
+        self._file = open(self.path, "ab")
+        self._end = self._file.tell()
+
+    def append(self, record):
+        with self.lock:
+            seq = self.count + 1
+            record = {"seq": seq, **record}
+            line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self.offsets.append(self._end)
+            self._end += len(line)
+            self.recent.append(record)
+            self.count = seq
+            self.cond.notify_all()
+            return record
+
+    def wait_for_new(self, seq, timeout=None):
+        """Block until a record newer than seq exists (or timeout); return the latest seq."""
+        with self.cond:
+            self.cond.wait_for(lambda: self.count > seq, timeout)
+            return self.count
+
+    def latest(self):
+        with self.lock:
+            return self.recent[-1] if self.recent else None
+
+    def records(self):
+        """Most recent records (up to ring_size), oldest first."""
+        with self.lock:
+            return list(self.recent)
+
+    def tail(self, limit):
+        """The last `limit` records, oldest first."""
+        with self.lock:
+            start = max(self.count - limit, 0)
+        return self.since(start, limit)
+
+    def since(self, seq, limit=100):
+        """Up to `limit` records with a sequence number greater than seq, oldest first."""
+        with self.lock:
+            seq = max(seq, 0)
+            end = min(seq + limit, self.count)
+            if end <= seq:
+                return []
+            first_in_ring = self.count - len(self.recent) + 1
+            if seq + 1 >= first_in_ring:
+                start = seq + 1 - first_in_ring
+                return [self.recent[i] for i in range(start, start + end - seq)]
+            offset = self.offsets[seq]
+        # Older than the ring: read the page back from disk
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return [json.loads(f.readline()) for _ in range(end - seq)]
+
+    def close(self):
+        with self.lock:
+            self._file.close()
@@ -1,12 +1,17 @@
-from flask import Flask, Response, render_template_string
-from picamera2 import Picamera2
-import cv2
-import time
+from flask import Flask, render_template_string
+import argparse
+
+from camera import add_camera_arguments
+from mjpeg import open_camera_stream, register_stream_routes
 
 app = Flask(__name__)
-picam2 = Picamera2()
-picam2.configure(picam2.create_video_configuration(main={"size": (640, 480)}))
-picam2.start()
+camera = None
+broadcaster = None
+
+def setup_camera(args):
+    global camera, broadcaster
+    camera, broadcaster = open_camera_stream(args)
+    register_stream_routes(app, broadcaster)
 
 HTML = """
 <!DOCTYPE html>
@@ -21,25 +26,12 @@ HTML = """
 </html>
 """
 
-def generate_stream():
-    while True:
-        frame = picam2.capture_array()
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
-            continue
-        frame_bytes = buffer.tobytes()
-        yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n")
-        time.sleep(0.1)
-
 @app.route('/')
 def index():
     return render_template_string(HTML)
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(generate_stream(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
-
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pi camera live stream.")
+    add_camera_arguments(parser)
+    setup_camera(parser.parse_args())
     app.run(host='0.0.0.0', port=5000, debug=False)
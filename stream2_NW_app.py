@@ -1,17 +1,53 @@
-from flask import Flask, Response, render_template_string, request, redirect
-from picamera2 import Picamera2
+"""
+Live stream + capture + H264 recording.
+
+By default /video_feed is served straight from the Pi's MJPEG encoder on the
+lores stream: picamera2 hands over finished JPEGs and Python only forwards
+the bytes. --software (or --replay DIR|VIDEO, for off-Pi testing without a
+camera) captures arrays and JPEG-encodes them in Python instead, with
+per-client quality adaptation. Recording runs as a second encoder on the
+main stream, so it doesn't interrupt the live view; it works with or
+without --software, but needs the Pi camera.
+
+Usage:
+    python3 stream2_NW_app.py [--software] [--replay DIR --fps 10]
+"""
+
+from flask import Flask, render_template_string, redirect
+import argparse
 import cv2
 import os
-import time
 from datetime import datetime
-from picamera2.encoders import H264Encoder
 
+from camera import PiCamera, add_camera_arguments
+from mjpeg import (MJPEGBroadcaster, EncoderOutput, DEFAULT_TIERS,
+                   open_camera_stream, register_stream_routes)
+
+MAIN_SIZE = (640, 480)
+STREAM_SIZE = (640, 480)
 
-app = Flask(__name__)
-picam2 = Picamera2()
 
-picam2.configure(picam2.create_video_configuration(main={"size": (640, 480)}))
-picam2.start()
+app = Flask(__name__)
+camera = None
+broadcaster = None
+
+def setup_camera(args, stream_size=STREAM_SIZE):
+    global camera, broadcaster
+    hardware = args.camera == "picamera" and not args.replay and not args.software
+
+    if hardware:
+        from picamera2.encoders import MJPEGEncoder
+        from picamera2.outputs import FileOutput
+        camera = PiCamera(MAIN_SIZE, video=True, lores=stream_size, warmup_s=0)
+        # Encoded JPEGs are pushed to clients as they arrive; they can only
+        # adapt by dropping frames, so there is a single quality tier
+        broadcaster = MJPEGBroadcaster(camera.capture_array, interval=0.1,
+                                       tiers=DEFAULT_TIERS[:1], produce=False)
+        camera.picam2.start_encoder(MJPEGEncoder(), FileOutput(EncoderOutput(broadcaster)), name="lores")
+        camera.start()
+    else:
+        camera, broadcaster = open_camera_stream(args, size=MAIN_SIZE)
+    register_stream_routes(app, broadcaster)
 
 # Output folder
 output_folder = "CapturedImages"
@@ -20,6 +56,7 @@ os.makedirs(output_folder, exist_ok=True)
 # Global video recording state
 recording = False
 video_filename = ""
+record_encoder = None
 
 # HTML with control buttons
 HTML = """
@@ -49,33 +86,16 @@ HTML = """
 </html>
 """
 
-# MJPEG stream
-def generate_stream():
-    while True:
-        frame = picam2.capture_array()
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
-            continue
-        frame_bytes = buffer.tobytes()
-        yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n")
-        time.sleep(0.1)
-
 @app.route('/')
 def index():
     return render_template_string(HTML, recording=recording)
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(generate_stream(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
-
 @app.route('/capture', methods=['POST'])
 def capture():
-    frame = picam2.capture_array()
+    frame = broadcaster.latest_frame()
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     filename = f"{output_folder}/stream_frame_{timestamp}.png"
-    cv2.imwrite(filename, frame)
+    cv2.imwrite(filename, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
     print(f"[✔] Frame saved: {filename}")
     return redirect("/")
 
@@ -83,20 +103,35 @@ def capture():
 
 @app.route('/record', methods=['POST'])
 def record():
-    global recording, video_filename
+    global recording, video_filename, record_encoder
+    # Any real Picamera2 can record, whether the live view is hardware or software encoded
+    picam2 = getattr(camera, "picam2", None)
+    if picam2 is None:
+        print("[!] Recording needs the Pi camera's H264 encoder (not available with --replay)")
+        return redirect("/")
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     if not recording:
+        from picamera2.encoders import H264Encoder
+        from picamera2.outputs import FileOutput
         video_filename = f"{output_folder}/stream_video_{timestamp}.h264"
-        encoder = H264Encoder(bitrate=2000000)
-        picam2.start_recording(encoder, video_filename)
+        record_encoder = H264Encoder(bitrate=2000000)
+        # A second encoder on the main stream; the MJPEG live view keeps running
+        picam2.start_encoder(record_encoder, FileOutput(video_filename), name="main")
         print(f"[🎥] Started recording: {video_filename}")
         recording = True
     else:
-        picam2.stop_recording()
+        picam2.stop_encoder(record_encoder)
         print(f"[⏹️] Stopped recording: {video_filename}")
         recording = False
     return redirect("/")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pi camera live stream with capture and recording.")
+    parser.add_argument("--software", action="store_true",
+                        help="JPEG-encode in Python instead of using the hardware MJPEG encoder")
+    add_camera_arguments(parser)
+    args = parser.parse_args()
+
+    setup_camera(args)
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -1,16 +1,21 @@
-from flask import Flask, Response, render_template_string, request, redirect
-from picamera2 import Picamera2
+from flask import Flask, render_template_string, redirect
+import argparse
 import cv2
-import time
 import os
 from datetime import datetime
 
+from camera import add_camera_arguments
+from mjpeg import open_camera_stream, register_stream_routes
+
 app = Flask(__name__)
 
-# Initialize camera
-picam2 = Picamera2()
-picam2.configure(picam2.create_video_configuration(main={"size": (640, 480)}))
-picam2.start()
+camera = None
+broadcaster = None
+
+def setup_camera(args):
+    global camera, broadcaster
+    camera, broadcaster = open_camera_stream(args)
+    register_stream_routes(app, broadcaster)
 
 # Output folder
 os.makedirs("CapturedImages", exist_ok=True)
@@ -32,37 +37,23 @@ HTML = """
 </html>
 """
 
-# MJPEG stream generator
-def generate_stream():
-    while True:
-        frame = picam2.capture_array()
-        ret, buffer = cv2.imencode('.jpg', frame)
-        if not ret:
-            continue
-        frame_bytes = buffer.tobytes()
-        yield (b"--frame\r\n"
-               b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n")
-        time.sleep(0.1)
-
 # Routes
 @app.route('/')
 def index():
     return render_template_string(HTML)
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(generate_stream(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
-
 @app.route('/capture', methods=['POST'])
 def capture():
-    frame = picam2.capture_array()
+    frame = broadcaster.latest_frame()
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     filename = f"CapturedImages/stream_{timestamp}.png"
-    cv2.imwrite(filename, frame)
+    cv2.imwrite(filename, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
     print(f"Saved: {filename}")
     return redirect("/")
 
 # Start server
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pi camera live stream with frame capture.")
+    add_camera_arguments(parser)
+    setup_camera(parser.parse_args())
     app.run(host='0.0.0.0', port=5000, debug=False)
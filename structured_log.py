@@ -0,0 +1,94 @@
+"""
+Structured Log
+==============
+Buffered, asynchronous JSON Lines logger for the capture/analysis loops.
+
+log() only puts a dict on a queue; a background writer thread collects
+whatever has arrived, writes it as one batch of JSON lines, and fsyncs at
+most every `fsync_interval` seconds. The capture and inference threads never
+wait on disk I/O, and a crash loses at most the last few seconds of records.
+
+Every record has "ts" (ISO time) and "stage", plus whatever fields the
+caller passes, typically frame, path, duration_ms and the detection result:
+
+    {"ts": "...", "stage": "inference", "frame": "output000042", "duration_ms": 231.4,
+     "detected": true, "conf": 0.25, "count": 1}
+
+so throughput per stage can be computed directly from the file, e.g. with
+pandas.read_json(path, lines=True).
+
+Usage:
+    log = StructuredLog("LogFiles/Log_....jsonl")
+    log.log("capture", frame="output000042", duration_ms=812.0)
+    log.close()    # also registered with atexit
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+class StructuredLog:
+    def __init__(self, path, flush_interval=0.5, fsync_interval=5.0, max_batch=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "a", encoding="utf-8")
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, stage, **fields):
+        """Queue one record; never blocks on I/O."""
+        if not self._closed:
+            self._queue.put({"ts": datetime.now().isoformat(timespec="milliseconds"),
+                             "stage": stage, **fields})
+
+    def _run(self):
+        last_fsync = time.monotonic()
+        dirty = False
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.max_batch:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._file.write("".join(json.dumps(r, default=str) + "\n" for r in batch))
+                self._file.flush()
+                self.written += len(batch)
+                dirty = True
+            now = time.monotonic()
+            if dirty and (stopping or now - last_fsync >= self.fsync_interval):
+                os.fsync(self._file.fileno())
+                last_fsync = now
+                dirty = False
+
+    def close(self):
+        """Write everything queued so far, fsync, and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()